@@ -0,0 +1,365 @@
+import os
+import sys
+import tempfile
+import time
+
+from Database_new import DB, Record, create_database_from_csv, create_database_from_csv_parallel, join
+
+
+def _timeit(fn, *args, **kwargs) -> float:
+    t0 = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - t0
+
+
+def _make_big_csv(path: str, copies: int, src: str = "Fortune500.csv") -> None:
+    # repeat the shipped CSV with a numeric suffix so keys stay unique and sorted
+    with open(src, "r", encoding="utf-8") as f:
+        rows = [line.rstrip("\n").split(",", 1) for line in f if line.strip()]
+    with open(path, "w", encoding="utf-8", newline="\n") as out:
+        for name, rest in rows:
+            for i in range(copies):
+                out.write(f"{name} {i:06d},{rest}\n")
+
+
+def bench_ingest(workdir: str, copies: int = 400) -> None:
+    csv_path = os.path.join(workdir, "big.csv")
+    _make_big_csv(csv_path, copies)
+    mb = os.path.getsize(csv_path) / (1024 * 1024)
+
+    serial = _timeit(create_database_from_csv, os.path.join(workdir, "serial"), csv_path)
+    print(f"ingest serial      : {serial:7.3f}s  {mb / serial:7.1f} MB/s")
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        t = _timeit(create_database_from_csv_parallel, os.path.join(workdir, f"par{workers}"),
+                    csv_path, workers=workers, chunk_bytes=4 * 1024 * 1024)
+        print(f"ingest parallel x{workers:<2}: {t:7.3f}s  {mb / t:7.1f} MB/s")
+
+
+def _make_big_db(workdir: str, copies: int = 200) -> str:
+    prefix = os.path.join(workdir, "bigdb")
+    if not os.path.isfile(prefix + ".config"):
+        csv_path = os.path.join(workdir, "bigdb.csv")
+        _make_big_csv(csv_path, copies)
+        create_database_from_csv(prefix, csv_path)
+    return prefix
+
+
+def bench_columns(workdir: str) -> None:
+    db = DB()
+    db.open(_make_big_db(workdir))
+    db.buildColumns()
+
+    db.hasColumns = False
+    row = _timeit(lambda: sum(1 for _ in db.scanColumns(["state"])))
+    db.hasColumns = True
+    col = _timeit(lambda: sum(1 for _ in db.scanColumns(["state"])))
+    row_bytes = db.numRecords * db.recordSize
+    col_bytes = db.numRecords * (db._widths["state"] + 1)
+    print(f"state scan rows    : {row:7.3f}s  {row_bytes / 1e6:8.2f} MB read")
+    print(f"state scan columns : {col:7.3f}s  {col_bytes / 1e6:8.2f} MB read  ({row_bytes / col_bytes:.1f}x less I/O)")
+    db.dropColumns()
+    db.close()
+
+
+def bench_bulk(workdir: str, batch: int = 5000) -> None:
+    import shutil
+
+    prefix = _make_big_db(workdir)
+    copy = os.path.join(workdir, "bulk")
+    for ext in (".config", ".data"):
+        shutil.copyfile(prefix + ext, copy + ext)
+
+    db = DB()
+    db.open(copy)
+    step = max(1, db.numRecords // batch)
+    recs = [r for n, r in db.scan() if n % step == 0][:batch]
+    for i in range(50):
+        db.addRecord(Record(f"ZZ OVERFLOW {i:04d}", "1", "X", "TX", "1", "1"))
+        recs.append(Record(f"ZZ OVERFLOW {i:04d}", "2", "Y", "TX", "2", "2"))
+    n = len(recs)
+
+    loop = _timeit(lambda: [db.updateRecord(Record(**vars(r))) for r in recs])
+    bulk = _timeit(db.updateRecords, [Record(**vars(r)) for r in recs])
+    print(f"updateRecord loop  : {loop:7.3f}s  {loop / n * 1e6:8.1f} us/record")
+    print(f"updateRecords      : {bulk:7.3f}s  {bulk / n * 1e6:8.1f} us/record  ({loop / bulk:.1f}x)")
+
+    names = [r.name for r in recs]
+    loop = _timeit(lambda: [db.deleteRecord(nm) for nm in names[: n // 2]])
+    bulk = _timeit(db.deleteRecords, names[n // 2 :])
+    half = max(1, n // 2)
+    print(f"deleteRecord loop  : {loop:7.3f}s  {loop / half * 1e6:8.1f} us/record")
+    print(f"deleteRecords      : {bulk:7.3f}s  {bulk / half * 1e6:8.1f} us/record  ({loop / bulk:.1f}x)")
+    db.close()
+
+
+def bench_open(workdir: str, rounds: int = 20) -> None:
+    prefix = _make_big_db(workdir)
+    db = DB()
+    db.open(prefix)
+    db.buildIndex()
+    db.close()
+    key = "WALMART 000100"
+
+    def open_find():
+        d = DB()
+        d.open(prefix)
+        d.findRecord(key)
+        d.close()
+
+    snap = _timeit(lambda: [open_find() for _ in range(rounds)]) / rounds
+
+    def open_find_rebuild():
+        os.utime(prefix + ".data")  # invalidate the snapshot
+        open_find()
+
+    rebuild = _timeit(lambda: [open_find_rebuild() for _ in range(3)]) / 3
+
+    def open_find_stale_read_only():
+        d = DB()
+        d.open(prefix, readOnly=True)
+        d.findRecord(key)
+        d.close()
+
+    os.utime(prefix + ".data")
+    stale_ro = _timeit(lambda: [open_find_stale_read_only() for _ in range(rounds)]) / rounds
+    db.open(prefix)
+    db.dropIndex()
+    db.close()
+    plain = _timeit(lambda: [open_find() for _ in range(rounds)]) / rounds
+    print(f"open+find, .idx mmap : {snap * 1e3:8.2f} ms")
+    print(f"open+find, rebuild   : {rebuild * 1e3:8.2f} ms")
+    print(f"open+find, stale, ro : {stale_ro * 1e3:8.2f} ms")
+    print(f"open+find, no index  : {plain * 1e3:8.2f} ms")
+
+
+def bench_alter(workdir: str) -> None:
+    import shutil
+
+    prefix = _make_big_db(workdir)
+    copy = os.path.join(workdir, "alter")
+    for ext in (".config", ".data"):
+        shutil.copyfile(prefix + ext, copy + ext)
+    new_widths = {"city": 24, "state": 3}
+
+    db = DB()
+    db.open(copy)
+    csv_path = os.path.join(workdir, "alter.csv")
+
+    def via_csv():
+        db.export("csv", csv_path)
+        w = dict(db._widths)
+        w.update(new_widths)
+        create_database_from_csv(os.path.join(workdir, "alter_csv"), csv_path, w)
+
+    round_trip = _timeit(via_csv)
+    alter = _timeit(db.alterWidths, new_widths)
+    print(f"export + CSV reload : {round_trip:7.3f}s")
+    print(f"alterWidths        : {alter:7.3f}s  ({round_trip / alter:.1f}x)")
+    db.close()
+
+
+def _drop_page_cache(path: str) -> None:
+    # best effort "cold cache": ask the kernel to drop the file's clean pages
+    if hasattr(os, "posix_fadvise"):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def bench_readahead(workdir: str) -> None:
+    prefix = _make_big_db(workdir)
+    db = DB()
+    db.open(prefix)
+    mb = db.numRecords * db.recordSize / (1024 * 1024)
+    for size in (0, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024):
+        db.readaheadBytes = size
+        _drop_page_cache(prefix + ".data")
+        t = _timeit(lambda: sum(1 for _ in db.scan()))
+        label = "sync" if size == 0 else f"{size // 1024} KB"
+        print(f"scan readahead {label:>7}: {t:7.3f}s  {mb / t:7.1f} MB/s")
+    db.close()
+
+
+def bench_verify(workdir: str) -> None:
+    prefix = _make_big_db(workdir)
+    db = DB()
+    db.open(prefix)
+    build = _timeit(db.buildChecksums)
+    mb = db.numRecords * db.recordSize / (1024 * 1024)
+    print(f"buildChecksums     : {build:7.3f}s")
+    for workers in sorted({1, os.cpu_count() or 1}):
+        _drop_page_cache(prefix + ".data")
+        t = _timeit(db.verify, workers)
+        print(f"verify x{workers:<2}         : {t:7.3f}s  {mb / t:7.1f} MB/s")
+    db.close()
+
+
+def bench_zones(workdir: str) -> None:
+    prefix = _make_big_db(workdir)
+    db = DB()
+    db.open(prefix)
+    queries = {
+        "rank <= 10": [("rank", "<=", 10)],
+        "employees > 100000": [("employees", ">", 100000)],
+        "state == TX": [("state", "==", "TX")],
+    }
+    for label, conds in queries.items():
+        db.hasZones = False
+        full = _timeit(lambda: sum(1 for _ in db.scanWhere(conds)))
+        db.hasZones = True
+        zoned = _timeit(lambda: sum(1 for _ in db.scanWhere(conds)))
+        st = db.zoneStats
+        print(f"{label:<20}: full {full:7.3f}s  zoned {zoned:7.3f}s  "
+              f"skipped {st['skipped']}/{st['blocks']} blocks  ({full / zoned:.1f}x)")
+    db.close()
+
+
+def bench_join(workdir: str) -> None:
+    import shutil
+
+    prefix = _make_big_db(workdir)
+    copy = os.path.join(workdir, "join")
+    for ext in (".config", ".data"):
+        shutil.copyfile(prefix + ext, copy + ext)
+    left, right = DB(), DB()
+    left.open(prefix)
+    right.open(copy)
+
+    def probe():
+        return sum(1 for _, r in left.scan() if right.findRecord(r.name) != -1)
+
+    loop = _timeit(probe)
+    merge = _timeit(lambda: sum(1 for _ in join(left, right)))
+    print(f"findRecord per row : {loop:7.3f}s")
+    print(f"merge join         : {merge:7.3f}s  ({loop / merge:.1f}x)")
+    left.close()
+    right.close()
+
+
+def bench_inserts(workdir: str, n: int = 20000, probes: int = 200) -> None:
+    import shutil
+
+    prefix = _make_big_db(workdir)
+    for buffered in (False, True):
+        copy = os.path.join(workdir, "inserts")
+        for ext in (".config", ".data"):
+            shutil.copyfile(prefix + ext, copy + ext)
+        db = DB()
+        db.open(copy)
+        if buffered:
+            db.enableInsertBuffer()
+        add = _timeit(lambda: [db.addRecord(Record(f"NEW CO {i:07d}", "1", "X", "TX", "1", "1"))
+                               for i in range(n)])
+        miss = _timeit(lambda: [db.findRecord(f"MISSING {i}") for i in range(probes)])
+        label = "buffered" if buffered else "append  "
+        print(f"addRecord {label} : {n / add:9.0f} inserts/s   miss lookup {miss / probes * 1e3:8.3f} ms")
+        if buffered:
+            print(f"  buffer            : {db.insertBufferStats()}")
+            print(f"  mergeInsertBuffer : {_timeit(db.mergeInsertBuffer):7.3f}s")
+        db.close()
+
+
+def bench_startup(workdir: str, rounds: int = 10) -> None:
+    import subprocess
+
+    prefix = _make_big_db(workdir)
+    key = "WALMART 000100"
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=here)
+
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import Database_new"],
+                         env=env, capture_output=True, text=True).stderr
+    for line in out.splitlines():
+        if line.rstrip().endswith("| Database_new"):
+            print(f"import Database_new : {int(line.split('|')[1]) / 1e3:7.2f} ms cumulative")
+
+    def run(argv):
+        return _timeit(lambda: [subprocess.run(argv, env=env, capture_output=True) for _ in range(rounds)]) / rounds
+
+    menu = run([sys.executable, "-c",
+                "import TestDB_new as t; d = t.DB(); d.open(%r); d.findRecord(%r); d.close()" % (prefix, key)])
+    cli = run([sys.executable, "-m", "Database_new", "find", prefix, key])
+    bare = run([sys.executable, "-c", "pass"])
+    print(f"python -c pass      : {bare * 1e3:7.2f} ms")
+    print(f"TestDB_new + find   : {menu * 1e3:7.2f} ms")
+    print(f"-m Database_new find: {cli * 1e3:7.2f} ms")
+
+
+def bench_unicode(workdir: str, n: int = 200000) -> None:
+    from Database_new import FIELDS, _default_widths, _record_size_for, _pack_field, _pack_fields, \
+        _pack_fields_chars, _unpack_fields_chars
+
+    words = ["SOCIÉTÉ", "GÉNÉRALE", "MÜNCHENER", "RÜCK", "日本電信電話", "トヨタ自動車", "ΕΛΛΗΝΙΚΆ",
+             "ГАЗПРОМ", "SÃO", "PAULO", "ŁÓDŹ", "ACME", "HOLDINGS", "GROUP", "中国石油"]
+    cities = ["ZÜRICH", "東京都千代田区", "SÃO PAULO", "ΑΘΉΝΑ", "МОСКВА", "DALLAS"]
+    rnd = __import__("random").Random(7)
+    recs = sorted((Record(" ".join(rnd.choice(words) for _ in range(rnd.randint(1, 6))) + f" {i:07d}",
+                          str(i % 500 + 1), rnd.choice(cities), "ZZ", f"{i % 99999:05d}", str(i))
+                   for i in range(n)), key=lambda r: r.name.upper())
+    w = _default_widths()
+    size = _record_size_for(w)
+    db = DB()
+    db._widths, db.recordSize = w, size
+
+    for label, pack, unpack in (
+        ("char layout", lambda r: _pack_fields_chars(r, w, size), lambda b: _unpack_fields_chars(b, w, 0)),
+        ("byte layout", lambda r: _pack_fields(r, w, size), db._unpack_record),
+    ):
+        t0 = time.perf_counter()
+        packed = [pack(r) for r in recs]
+        t1 = time.perf_counter()
+        out = [unpack(b) for b in packed]
+        t2 = time.perf_counter()
+        # a field is damaged if it is not a prefix of the original value
+        damaged = sum(1 for a, b in zip(recs, out) if any(not getattr(a, f).startswith(getattr(b, f)) for f in FIELDS))
+        # cutting names can put sorted input out of order; create re-sorts it
+        keys = [r.name.strip().upper() for r in out]
+        inverted = sum(1 for a, b in zip(keys, keys[1:]) if b < a)
+        print(f"{label}: pack {n / (t1 - t0):9.0f} rec/s  unpack {n / (t2 - t1):9.0f} rec/s  "
+              f"damaged records {damaged}/{n}  out of order {inverted}")
+
+    prefix = os.path.join(workdir, "unicode")
+    from Database_new import create_database_from_records
+    t = _timeit(create_database_from_records, prefix, recs)
+    db = DB()
+    db.open(prefix)
+    scan = _timeit(lambda: sum(1 for _ in db.scan()))
+    keys = [r.name.strip().upper() for _, r in db.scan()]
+    inverted = sum(1 for a, b in zip(keys, keys[1:]) if b < a)
+    # names are looked up as stored, i.e. cut to the name width
+    sample = recs[:: max(1, n // 1000)]
+    missing = sum(1 for r in sample if db.findRecord(_pack_field(r.name, w["name"]).decode("utf-8")) == -1)
+    print(f"create {t:7.3f}s  scan {scan:7.3f}s  ({n} multilingual records)  "
+          f"stored keys out of order {inverted}  sampled names not found {missing}/{len(sample)}")
+    db.close()
+
+
+BENCHMARKS = {
+    "ingest": bench_ingest,
+    "columns": bench_columns,
+    "bulk": bench_bulk,
+    "open": bench_open,
+    "alter": bench_alter,
+    "readahead": bench_readahead,
+    "verify": bench_verify,
+    "zones": bench_zones,
+    "join": bench_join,
+    "inserts": bench_inserts,
+    "startup": bench_startup,
+    "unicode": bench_unicode,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            print(f"\n--- {name} ---")
+            BENCHMARKS[name](workdir)
+
+
+if __name__ == "__main__":
+    main()
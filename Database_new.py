@@ -1,17 +1,125 @@
 
-import csv
+# Imports are kept to what open() + findRecord need: a one-shot lookup
+# (python -m Database_new find ...) should not pay for csv, json,
+# dataclasses or typing, so those are imported where they are used or
+# only for type checkers.
+from __future__ import annotations
+
+import array
+import heapq
+import mmap
 import os
-from dataclasses import dataclass
-from typing import Optional, Tuple, Dict, Any
+import queue
+import threading
+import weakref
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import chain, groupby
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Optional, Tuple, Dict, Any, Iterable, Iterator, List, Callable
+
+FIELDS = ("name", "rank", "city", "state", "zip", "employees")
+NUMERIC_FIELDS = ("rank", "employees")
 
-@dataclass
 class Record:
-    name: str = ""
-    rank: str = ""
-    city: str = ""
-    state: str = ""
-    zip: str = ""
-    employees: str = ""
+    # plain class with the dataclass's constructor, repr and equality;
+    # vars(r) gives the field dict
+    __match_args__ = FIELDS
+
+    def __init__(self, name: str = "", rank: str = "", city: str = "",
+                 state: str = "", zip: str = "", employees: str = ""):
+        self.name = name
+        self.rank = rank
+        self.city = city
+        self.state = state
+        self.zip = zip
+        self.employees = employees
+
+    def __repr__(self) -> str:
+        return "Record(" + ", ".join(f"{f}={getattr(self, f)!r}" for f in FIELDS) + ")"
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return vars(self) == vars(other)
+
+    __hash__ = None  # mutable, like the dataclass it replaces
+
+class RecordCache:
+    """
+    Bounded LRU cache of decoded Records, keyed both by normalized name and
+    by record number. A name can also be cached as a miss (recordNum -1) so
+    repeated lookups of absent companies skip the overflow scan.
+    Records are copied in and out so callers cannot mutate cached state.
+    """
+
+    def __init__(self, maxEntries: int = 1024):
+        self.maxEntries = max(1, maxEntries)
+        self._entries: "OrderedDict[Tuple[str, Any], Tuple[int, Optional[Record]]]" = OrderedDict()
+        # recordNum -> name key of the cached positive lookup that points at it
+        self._nameOf: Dict[int, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: Tuple[str, Any]) -> Optional[Tuple[int, Optional[Record]]]:
+        hit = self._entries.get(key)
+        if hit is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        recno, r = hit
+        return (recno, Record(**vars(r)) if r is not None else None)
+
+    def _put(self, key: Tuple[str, Any], recno: int, r: Optional[Record]) -> None:
+        self._entries[key] = (recno, Record(**vars(r)) if r is not None else None)
+        self._entries.move_to_end(key)
+        if key[0] == "name" and recno != -1:
+            self._nameOf[recno] = key[1]
+        while len(self._entries) > self.maxEntries:
+            (kind, k), (n, _) = self._entries.popitem(last=False)
+            if kind == "name" and self._nameOf.get(n) == k:
+                del self._nameOf[n]
+
+    def getName(self, key: str) -> Optional[Tuple[int, Optional[Record]]]:
+        return self._get(("name", key))
+
+    def putName(self, key: str, recno: int, r: Optional[Record]) -> None:
+        self._put(("name", key), recno, r)
+
+    def getRecno(self, recno: int) -> Optional[Record]:
+        hit = self._get(("recno", recno))
+        return hit[1] if hit is not None else None
+
+    def putRecno(self, recno: int, r: Record) -> None:
+        self._put(("recno", recno), recno, r)
+
+    def invalidate(self, recno: int, key: str) -> None:
+        # drop the slot, whatever name it was cached under, and any cached
+        # result (including a miss) for the name now written there
+        self._entries.pop(("recno", recno), None)
+        old = self._nameOf.pop(recno, None)
+        if old is not None:
+            self._entries.pop(("name", old), None)
+        self._entries.pop(("name", key), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._nameOf.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.maxEntries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": self.hits / total if total else 0.0,
+        }
+
 
 class DB:
     """
@@ -47,6 +155,71 @@ class DB:
 
         self._prefix: Optional[str] = None
 
+        # legacy layouts opened read-only (see detect_format); Part 1 files
+        # carry a leading KEY field that is skipped on unpack
+        self.readOnly = False
+        self.fileFormat = "current"
+        self._keyWidth = 0
+
+        # files written before layout=bytes pad fields by characters; they
+        # are read and written that way until alterWidths rewrites them
+        self._charLayout = False
+
+        # optional columnar sidecars: <prefix>.<field>.col (+ <prefix>.live.col)
+        self.hasColumns = False
+        self._columnFiles: Dict[str, Any] = {}
+
+        # open snapshots that still need pre-images of overwritten records
+        self._snapshots: "weakref.WeakSet[Snapshot]" = weakref.WeakSet()
+        self._snapshotLock = threading.Lock()
+
+        # optional in-memory key index, persisted to <prefix>.idx on close
+        self.hasIndex = False
+        self._indexKeys: Any = None            # list or _MappedKeys (sorted portion)
+        self._indexOverflow: Dict[str, int] = {}
+        self._indexMap: Optional[mmap.mmap] = None
+        self._indexFile: Any = None
+        self._indexDirty = False
+
+        # optional decoded-record cache in front of findRecord / readRecord
+        self._cache: Optional[RecordCache] = None
+
+        # zone maps: per-block min/max (rank, employees) and state values,
+        # persisted to <prefix>.zones; zoneStats describes the last scanWhere
+        self.hasZones = False
+        self._zones: List[Dict[str, Any]] = []
+        self._zonesDirty = False
+        self.zoneStats: Dict[str, int] = {}
+
+        # optional LSM-style insert buffer: addRecord goes to an in-memory
+        # memtable (logged to <prefix>.memlog), flushed as sorted run files
+        # <prefix>.run<N> that a background thread merges; see enableInsertBuffer
+        self.hasInsertBuffer = False
+        self.memtableLimit = MEMTABLE_RECORDS
+        self._memtable: Dict[str, Record] = {}
+        self._memlog: Any = None
+        self._runs: List[_Run] = []          # oldest first
+        self._runIds: List[int] = []         # as listed in the config
+        self._nextRun = 0
+        self._retiredRuns: List[_Run] = []   # merged away, deleted once the config drops them
+        self._runLock = threading.Lock()
+        self._mergeThread: Optional[threading.Thread] = None
+
+        # page(): overflow (key, recordNum) pairs in key order, rebuilt
+        # whenever numRecords has moved since they were taken
+        self._overflowKeys: List[Tuple[str, int]] = []
+        self._overflowKeysAt = -1
+
+        # optional per-block CRC32 sidecar: <prefix>.crc
+        self.hasChecksums = False
+        self._crcs: "array.array[int]" = array.array("I")
+        self._crcFile: Any = None
+        self._crcDirty: set = set()
+
+        # bytes prefetched per chunk by the background reader used for
+        # sequential scans; 0 reads synchronously on the main handle
+        self.readaheadBytes = READAHEAD_BYTES
+
     # -----------------------------
     # helpers for config
     # -----------------------------
@@ -70,6 +243,48 @@ class DB:
                 )
                 + "\n"
             )
+            if not self._charLayout:
+                f.write("layout=bytes\n")
+            if self.hasColumns:
+                f.write("columns=1\n")
+            if self.hasIndex:
+                f.write("index=1\n")
+            if self.hasChecksums:
+                f.write("checksums=1\n")
+            if self.hasZones:
+                f.write("zonemaps=1\n")
+            if self.hasInsertBuffer:
+                with self._runLock:
+                    runs = ",".join(str(run.runId) for run in self._runs)
+                    nextRun = self._nextRun
+                f.write("insertBuffer=1\n")
+                f.write(f"runs={runs}\n")
+                f.write(f"nextRun={nextRun}\n")
+
+    def _read_part1_config(self, prefix: str) -> bool:
+        # Database_Part1 layout: two-line config (record count, then a size
+        # that was measured with CRLF line endings, so it is not trusted) and
+        # KEY(10) NAME(40) RANK(6) CITY(20) STATE(5) ZIP(10) EMPLOYEES(10) + "\n"
+        try:
+            with open(self._config_filename(prefix), "r", encoding="utf-8") as f:
+                count = int(f.readline().strip())
+            size = os.path.getsize(self._data_filename(prefix))
+        except (OSError, ValueError):
+            return False
+        if count <= 0 or size % count != 0:
+            return False
+
+        self._keyWidth = PART1_KEY_WIDTH
+        self._charLayout = True
+        self._widths = dict(PART1_WIDTHS)
+        self.numSortedRecords = count
+        self.numUnsortedRecords = 0
+        self.numRecords = count
+        self.numOverflow = 0
+        self.recordSize = size // count
+        self.readOnly = True
+        self.fileFormat = "part1"
+        return True
 
     def _read_config(self, prefix: str) -> bool:
         cfg = self._config_filename(prefix)
@@ -98,6 +313,14 @@ class DB:
 
             self.numRecords = self.numSortedRecords + self.numUnsortedRecords
             self.numOverflow = self.numUnsortedRecords
+            self.hasColumns = vals.get("columns", "0") == "1"
+            self.hasIndex = vals.get("index", "0") == "1"
+            self.hasChecksums = vals.get("checksums", "0") == "1"
+            self.hasZones = vals.get("zonemaps", "0") == "1"
+            self._charLayout = vals.get("layout", "") != "bytes"
+            self.hasInsertBuffer = vals.get("insertBuffer", "0") == "1"
+            self._runIds = [int(x) for x in vals.get("runs", "").split(",") if x]
+            self._nextRun = int(vals.get("nextRun", "0"))
             return True
         except Exception:
             return False
@@ -107,53 +330,46 @@ class DB:
     # -----------------------------
     def _pack_record(self, r: Record) -> bytes:
         # NOTE: truncation is intentional to maintain fixed record size
-        s = (
-            f"{r.name:<{self._widths['name']}.{self._widths['name']}}"
-            f"{r.rank:<{self._widths['rank']}.{self._widths['rank']}}"
-            f"{r.city:<{self._widths['city']}.{self._widths['city']}}"
-            f"{r.state:<{self._widths['state']}.{self._widths['state']}}"
-            f"{r.zip:<{self._widths['zip']}.{self._widths['zip']}}"
-            f"{r.employees:<{self._widths['employees']}.{self._widths['employees']}}"
-            "\n"
-        )
-        b = s.encode("utf-8", errors="replace")
-        # ensure record is exactly recordSize bytes
-        if self.recordSize > 0:
-            if len(b) < self.recordSize:
-                b = b[:-1] + (b" " * (self.recordSize - len(b))) + b"\n"
-            elif len(b) > self.recordSize:
-                b = b[: self.recordSize - 1] + b"\n"
-        return b
+        if self._charLayout:
+            return _pack_fields_chars(r, self._widths, self.recordSize)
+        return _pack_fields(r, self._widths, self.recordSize)
 
     def _unpack_record(self, b: bytes) -> Record:
-        s = b.decode("utf-8", errors="replace")
-        # strip only final newline; keep padding for slicing
-        if s.endswith("\n"):
-            s = s[:-1]
-        i = 0
         w = self._widths
-        name = s[i : i + w["name"]].rstrip(); i += w["name"]
-        rank = s[i : i + w["rank"]].rstrip(); i += w["rank"]
-        city = s[i : i + w["city"]].rstrip(); i += w["city"]
-        state = s[i : i + w["state"]].rstrip(); i += w["state"]
-        zipc = s[i : i + w["zip"]].rstrip(); i += w["zip"]
-        emp = s[i : i + w["employees"]].rstrip()
-        return Record(name, rank, city, state, zipc, emp)
+        i = self._keyWidth
+        if b.isascii() or self._charLayout:
+            # one decode serves every field when bytes and characters line up
+            return _unpack_fields_chars(b, w, i)
+        return _unpack_fields(b, w, i)
 
     def _valid_record_num(self, recordNum: int) -> bool:
         return self.isOpen() and 0 <= recordNum < self.numRecords
 
+    def _writable(self) -> bool:
+        return self.isOpen() and not self.readOnly
+
     # -----------------------------
     # open/close/isOpen
     # -----------------------------
     def isOpen(self) -> bool:
         return self.dataFilestream is not None and not self.dataFilestream.closed
 
-    def open(self, prefix: str) -> bool:
+    def open(self, prefix: str, readOnly: bool = False) -> bool:
+        """
+        Opens <prefix>.config/.data. With readOnly the data file is opened
+        "rb", every write method returns False, close() writes nothing back,
+        and zone maps are only loaded when scanWhere first needs them.
+        """
         if self.isOpen():
             return False
 
-        if not self._read_config(prefix):
+        self.readOnly = readOnly
+
+        fmt = detect_format(prefix)
+        if fmt == "part1":
+            if not self._read_part1_config(prefix):
+                return False
+        elif fmt != "current" or not self._read_config(prefix):
             return False
 
         data_path = self._data_filename(prefix)
@@ -161,17 +377,68 @@ class DB:
             return False
 
         # r+b so we can read and overwrite
-        self.dataFilestream = open(data_path, "r+b")
+        self.dataFilestream = open(data_path, "rb" if self.readOnly else "r+b")
         self._prefix = prefix
+        if self.hasColumns and not self._open_columns():
+            # stale or missing sidecars: fall back to row-only until rebuilt
+            self.hasColumns = False
+        if self.hasIndex and not self._load_index():
+            if self.readOnly:
+                # a rebuild could never be saved from here and costs a full
+                # scan on every open: use plain binary search instead
+                self.hasIndex = False
+            else:
+                # stale or missing snapshot: one sequential pass rebuilds it
+                self._build_index()
+        if self.hasChecksums and not self._load_checksums():
+            self.hasChecksums = False
+        if self.hasZones and not self.readOnly and not self._load_zones():
+            # written without a clean close: one sequential pass rebuilds them
+            self._build_zones()
+        if self.hasInsertBuffer and not self._open_insert_buffer():
+            # a missing run would silently lose inserts: refuse to open
+            self.readOnly = True
+            self.close()
+            return False
         return True
 
     def close(self) -> None:
+        if self.hasInsertBuffer:
+            self._wait_merge()
+            if not self.readOnly:
+                self._reap_runs()
+
         # write config (only if we have a prefix)
-        if self._prefix is not None and self.numSortedRecords >= 0 and self.recordSize > 0:
+        if self._prefix is not None and self.numSortedRecords >= 0 and self.recordSize > 0 and not self.readOnly:
             try:
                 self._write_config(self._prefix)
             except Exception:
                 pass
+            if self.hasIndex and self.dataFilestream is not None:
+                try:
+                    self._save_index()
+                except Exception:
+                    pass
+            if self.hasChecksums and self.dataFilestream is not None:
+                try:
+                    self._flush_checksums()
+                except Exception:
+                    pass
+            if self.hasZones and self._zonesDirty and self.dataFilestream is not None:
+                try:
+                    self._save_zones()
+                except Exception:
+                    pass
+
+        # snapshots keep reading the file through their own handles; this
+        # handle will not write it again, so they need no more pre-images
+        with self._snapshotLock:
+            self._snapshots.clear()
+
+        self._close_columns()
+        self._release_index()
+        self._close_checksums()
+        self._close_insert_buffer()
 
         # close file
         if self.dataFilestream is not None:
@@ -188,6 +455,24 @@ class DB:
         self.recordSize = -1
         self.numOverflow = 0
         self._prefix = None
+        self.hasColumns = False
+        self.hasIndex = False
+        self.hasChecksums = False
+        self.hasZones = False
+        self._zones = []
+        self._zonesDirty = False
+        self._overflowKeys = []
+        self._overflowKeysAt = -1
+        self.hasInsertBuffer = False
+        self._runIds = []
+        self._nextRun = 0
+        self.readOnly = False
+        self.fileFormat = "current"
+        self._keyWidth = 0
+        self._charLayout = False
+        self._widths = _default_widths()
+        if self._cache is not None:
+            self._cache.clear()
 
     # -----------------------------
     # public helper: readRecord
@@ -205,11 +490,13 @@ class DB:
             return (False, None)
 
         try:
-            self.dataFilestream.seek(recordNum * self.recordSize)
-            b = self.dataFilestream.read(self.recordSize)
-            if len(b) != self.recordSize:
-                return (False, None)
-            r = self._unpack_record(b)
+            r = self._cache.getRecno(recordNum) if self._cache is not None else None
+            if r is None:
+                r = self._read_at(recordNum)
+                if r is None:
+                    return (False, None)
+                if self._cache is not None:
+                    self._cache.putRecno(recordNum, r)
 
             # fill wrappers if provided
             if isinstance(name, list): name[0] = r.name
@@ -227,30 +514,87 @@ class DB:
         except Exception:
             return (False, None)
 
+    def _read_at(self, recordNum: int) -> Optional[Record]:
+        # uncached read for search probes and other internal reads, so they
+        # neither count in cacheStats() nor evict the entries callers use
+        if not self._valid_record_num(recordNum):
+            return None
+        self.dataFilestream.seek(recordNum * self.recordSize)
+        b = self.dataFilestream.read(self.recordSize)
+        if len(b) != self.recordSize:
+            return None
+        return self._unpack_record(b)
+
     # -----------------------------
     # public helper: writeRecord (writes at current file position)
     # -----------------------------
     def writeRecord(self, r: Record) -> bool:
-        if not self.isOpen():
+        if not self._writable():
             return False
         try:
-            self.dataFilestream.write(self._pack_record(r))
+            pos = self.dataFilestream.tell()
+            b = self._pack_record(r)
+            if self.recordSize > 0 and pos % self.recordSize == 0:
+                self._record_will_write(pos // self.recordSize)
+            self.dataFilestream.write(b)
+            if self.recordSize > 0 and pos % self.recordSize == 0:
+                self._record_written(pos // self.recordSize, r, b)
             return True
         except Exception:
             return False
 
     # overwrite at record number (handy internal helper)
     def _overwrite_at(self, recordNum: int, r: Record) -> bool:
-        if not self._valid_record_num(recordNum):
+        if not self._valid_record_num(recordNum) or self.readOnly:
             return False
         try:
+            b = self._pack_record(r)
+            self._record_will_write(recordNum)
             self.dataFilestream.seek(recordNum * self.recordSize)
-            self.dataFilestream.write(self._pack_record(r))
+            self.dataFilestream.write(b)
             self.dataFilestream.flush()
+            self._record_written(recordNum, r, b)
+            self._flush_checksums()
             return True
         except Exception:
             return False
 
+    # copy-on-write for open snapshots: save the record's current bytes
+    # before the first overwrite the snapshot would otherwise see
+    def _record_will_write(self, recordNum: int) -> None:
+        if not self._snapshots:
+            return
+        with self._snapshotLock:
+            snaps = [s for s in self._snapshots
+                     if recordNum < s.numRecords and recordNum not in s._versions]
+            if not snaps:
+                return
+            pos = self.dataFilestream.tell()
+            self.dataFilestream.flush()
+            self.dataFilestream.seek(recordNum * self.recordSize)
+            old = self.dataFilestream.read(self.recordSize)
+            self.dataFilestream.seek(pos)
+            for snap in snaps:
+                snap._versions[recordNum] = old
+
+    # every write path funnels through here so sidecar files stay in sync
+    def _record_written(self, recordNum: int, r: Record, packed: bytes) -> None:
+        if self.hasColumns:
+            self._columns_write(recordNum, r)
+        if self.hasIndex:
+            self._index_write(recordNum, r)
+        if self._cache is not None:
+            self._cache.invalidate(recordNum, r.name.strip().upper())
+        if self.hasChecksums:
+            self._crcDirty.add(recordNum // CRC_BLOCK_RECORDS)
+        if self.hasZones:
+            # widen only: a zone may over-cover its block but never under-cover
+            block = recordNum // ZONE_BLOCK_RECORDS
+            while len(self._zones) <= block:
+                self._zones.append(_new_zone())
+            _zone_add(self._zones[block], r.rank, r.employees, r.state)
+            self._zonesDirty = True
+
     # -----------------------------
     # private helper: binarySearch (sorted portion only)
     # -----------------------------
@@ -258,13 +602,20 @@ class DB:
         if not self.isOpen() or self.numSortedRecords <= 0:
             return (-1, None)
 
-        low, high = 0, self.numSortedRecords - 1
         target = (target_name or "").strip().upper().upper()
+        if self.hasIndex:
+            i = bisect_left(self._indexKeys, target)
+            if i < self.numSortedRecords and self._indexKeys[i] == target:
+                r = self._read_at(i)
+                return (i, r) if r is not None else (-1, None)
+            return (-1, None)
+
+        low, high = 0, self.numSortedRecords - 1
 
         while low <= high:
             mid = (low + high) // 2
-            ok, r = self.readRecord(mid)
-            if not ok or r is None:
+            r = self._read_at(mid)
+            if r is None:
                 return (-1, None)
 
             mid_name = r.name.strip().upper()
@@ -286,18 +637,41 @@ class DB:
             return (-1, None)
 
         target = (target_name or "").strip().upper()
-        start = self.numSortedRecords
-        end = self.numSortedRecords + self.numUnsortedRecords - 1
+        if self.hasIndex:
+            recno = self._indexOverflow.get(target, -1)
+            if recno == -1:
+                return (-1, None)
+            r = self._read_at(recno)
+            return (recno, r) if r is not None else (-1, None)
 
-        for recno in range(start, end + 1):
-            ok, r = self.readRecord(recno)
-            if not ok or r is None:
-                break
+        for recno, r in self._scan_range(self.numSortedRecords, self.numRecords):
             if r.name.strip().upper() == target:
                 return (recno, r)
 
         return (-1, None)
 
+    # sorted portion, then overflow, through the cache when one is enabled
+    def _lookup(self, target_name: str) -> Tuple[int, Optional[Record]]:
+        key = (target_name or "").strip().upper()
+        if self.hasInsertBuffer:
+            r = self._buffer_get(key)
+            if r is not None:
+                return (BUFFERED_RECORD, r)
+        if self._cache is not None:
+            hit = self._cache.getName(key)
+            if hit is not None:
+                return hit
+
+        recno, r = self._binarySearch(target_name)
+        if recno == -1:
+            recno, r = self._linearSearch(target_name)
+        if recno == -1:
+            r = None
+
+        if self._cache is not None:
+            self._cache.putName(key, recno, r)
+        return (recno, r)
+
     # -----------------------------
     # public helper: findRecord
     # -----------------------------
@@ -307,16 +681,15 @@ class DB:
         """
         Searches by primary key (name).
         Fills wrappers / record if found, else resets them to "".
-        Returns recordNum or -1.
+        Returns recordNum, BUFFERED_RECORD for a record still in the insert
+        buffer, or -1.
         """
         if not self.isOpen():
             return -1
 
         # allow passing name as list wrapper or string
         target = name[0] if isinstance(name, list) else str(name)
-        recno, r = self._binarySearch(target)
-        if recno == -1:
-            recno, r = self._linearSearch(target)
+        recno, r = self._lookup(target)
 
         if recno != -1 and r is not None:
             if isinstance(name, list): name[0] = r.name
@@ -349,14 +722,14 @@ class DB:
         if not self.isOpen():
             return False
 
-        recno, existing = self._binarySearch(r.name)
-        if recno == -1:
-            recno, existing = self._linearSearch(r.name)
+        recno, existing = self._lookup(r.name)
         if recno == -1 or existing is None:
             return False
 
         # enforce stored key spelling/case to keep sorted section consistent
         r.name = existing.name
+        if recno == BUFFERED_RECORD:
+            return self._buffer_put(r)
         return self._overwrite_at(recno, r)
 
     # -----------------------------
@@ -366,9 +739,7 @@ class DB:
         if not self.isOpen():
             return False
 
-        recno, r = self._binarySearch(name)
-        if recno == -1:
-            recno, r = self._linearSearch(name)
+        recno, r = self._lookup(name)
         if recno == -1 or r is None:
             return False
 
@@ -381,24 +752,32 @@ class DB:
             zip="",
             employees="",
         )
+        if recno == BUFFERED_RECORD:
+            return self._buffer_put(deleted)
         return self._overwrite_at(recno, deleted)
 
     # -----------------------------
     # public: addRecord (append unsorted)
     # -----------------------------
     def addRecord(self, r: Record) -> bool:
-        if not self.isOpen():
+        if not self._writable():
             return False
+        if self.hasInsertBuffer:
+            return self._buffer_put(r)
 
         # append at end of file
         try:
             self.dataFilestream.seek(0, os.SEEK_END)
-            self.dataFilestream.write(self._pack_record(r))
+            recno = self.dataFilestream.tell() // self.recordSize
+            b = self._pack_record(r)
+            self.dataFilestream.write(b)
             self.dataFilestream.flush()
+            self._record_written(recno, r, b)
 
             self.numUnsortedRecords += 1
             self.numOverflow = self.numUnsortedRecords
             self.numRecords = self.numSortedRecords + self.numUnsortedRecords
+            self._flush_checksums()
 
             # persist config immediately to be safe
             if self._prefix is not None:
@@ -408,6 +787,2118 @@ class DB:
         except Exception:
             return False
 
+    # -----------------------------
+    # public: bulk updateRecords / deleteRecords
+    # -----------------------------
+    def _resolve_keys(self, names: Iterable[str]) -> Dict[str, Tuple[int, Record]]:
+        """
+        Looks up many keys in one pass: the sorted keys are binary searched
+        with a low bound that only moves forward, and every key still missing
+        is matched in a single sequential scan of the overflow.
+        Returns {normalized name: (recordNum, Record)} for the keys found.
+        """
+        targets = sorted({(n or "").strip().upper() for n in names})
+        found: Dict[str, Tuple[int, Record]] = {}
+        if self.hasInsertBuffer:
+            for target in targets:
+                r = self._buffer_get(target)
+                if r is not None:
+                    found[target] = (BUFFERED_RECORD, r)
+            targets = [t for t in targets if t not in found]
+
+        if self.hasIndex:
+            for target in targets:
+                recno, r = self._binarySearch(target)
+                if recno == -1:
+                    recno, r = self._linearSearch(target)
+                if recno != -1 and r is not None:
+                    found[target] = (recno, r)
+            return found
+
+        found.update(self._gallop(targets))
+        missing = {t for t in targets if t not in found}
+        if missing and self.numUnsortedRecords > 0:
+            for recno, r in self._scan_range(self.numSortedRecords, self.numRecords):
+                key = r.name.strip().upper()
+                if key in missing:
+                    found[key] = (recno, r)
+                    missing.discard(key)
+                    if not missing:
+                        break
+        return found
+
+    def _gallop(self, targets: List[str]) -> Dict[str, Tuple[int, Record]]:
+        # galloping search of the sorted portion for ascending targets: start
+        # from the previous hit and double the step until we overshoot, then
+        # bisect that bracket
+        found: Dict[str, Tuple[int, Record]] = {}
+        low = 0
+        n = self.numSortedRecords
+        for target in targets:
+            if low >= n:
+                break
+            step, hi = 1, low
+            while hi < n and self._read_key(hi) < target:
+                low = hi + 1
+                hi = low + step
+                step *= 2
+            hi = min(hi, n - 1)
+            while low <= hi:
+                mid = (low + hi) // 2
+                mid_name = self._read_key(mid)
+                if mid_name < target:
+                    low = mid + 1
+                else:
+                    hi = mid - 1
+            if low < n and self._read_key(low) == target:
+                r = self._read_at(low)
+                if r is not None:
+                    found[target] = (low, r)
+                low += 1
+        return found
+
+    def _read_key(self, recordNum: int) -> str:
+        # normalized name only, without decoding the rest of the record
+        self.dataFilestream.seek(recordNum * self.recordSize + self._keyWidth)
+        b = self.dataFilestream.read(self._widths["name"])
+        return b.decode("utf-8", errors="replace").strip().upper()
+
+    def _write_batch(self, updates: Dict[int, Record]) -> int:
+        # coalesce adjacent record numbers into one seek + write per run,
+        # flushing once at the end
+        recnos = sorted(updates)
+        i = 0
+        while i < len(recnos):
+            j = i
+            while j + 1 < len(recnos) and recnos[j + 1] == recnos[j] + 1:
+                j += 1
+            run = recnos[i : j + 1]
+            packed = [self._pack_record(updates[n]) for n in run]
+            for n in run:
+                self._record_will_write(n)
+            self.dataFilestream.seek(run[0] * self.recordSize)
+            self.dataFilestream.write(b"".join(packed))
+            for n, b in zip(run, packed):
+                self._record_written(n, updates[n], b)
+            i = j + 1
+        self.dataFilestream.flush()
+        self._flush_checksums()
+        return len(recnos)
+
+    def _write_resolved(self, hits: List[Tuple[int, Record]]) -> List[bool]:
+        # writes records whose keys are already resolved to (recordNum, Record):
+        # file records as one coalesced batch, BUFFERED_RECORD ones through
+        # the insert buffer. One result per hit, in order.
+        updates = {recno: r for recno, r in hits if recno != BUFFERED_RECORD}
+        try:
+            self._write_batch(updates)
+            file_ok = True
+        except Exception:
+            file_ok = False
+        return [self._buffer_put(r) if recno == BUFFERED_RECORD else file_ok for recno, r in hits]
+
+    def findRecords(self, names: Iterable[str]) -> List[Tuple[int, Optional[Record]]]:
+        """
+        Batched findRecord: one (recordNum, Record) per name, in input order,
+        (-1, None) for names that are not present.
+        """
+        if not self.isOpen():
+            return []
+        names = list(names)
+        found = self._resolve_keys(names)
+        return [found.get((n or "").strip().upper(), (-1, None)) for n in names]
+
+    def updateRecords(self, records: Iterable[Record]) -> int:
+        """
+        Batched updateRecord. Keys are resolved together, writes to adjacent
+        records are merged, and the file is flushed once.
+        Returns the number of records updated (unknown keys are skipped;
+        for duplicate keys the last record wins).
+        """
+        if not self._writable():
+            return 0
+        records = list(records)
+        found = self._resolve_keys(r.name for r in records)
+
+        # one entry per key: for duplicates the last record wins
+        hits: Dict[str, Tuple[int, Record]] = {}
+        for r in records:
+            key = (r.name or "").strip().upper()
+            hit = found.get(key)
+            if hit is None:
+                continue
+            recno, existing = hit
+            # enforce stored key spelling/case to keep sorted section consistent
+            r.name = existing.name
+            hits[key] = (recno, r)
+        return sum(self._write_resolved(list(hits.values())))
+
+    def deleteRecords(self, names: Iterable[str]) -> int:
+        """Batched deleteRecord. Returns the number of records deleted."""
+        if not self._writable():
+            return 0
+        found = self._resolve_keys(names)
+        return sum(self._write_resolved([(recno, Record(name=r.name)) for recno, r in found.values()]))
+
+    # -----------------------------
+    # public: scan (sequential, chunked)
+    # -----------------------------
+    SCAN_CHUNK_RECORDS = 4096
+
+    @staticmethod
+    def _is_deleted(r: Record) -> bool:
+        # deleteRecord keeps the key and blanks every other field
+        return not (r.rank or r.city or r.state or r.zip or r.employees)
+
+    def scan(self, predicate: Optional[Callable[[Record], bool]] = None,
+             includeDeleted: bool = False) -> Iterator[Tuple[int, Record]]:
+        """
+        Yields (recordNum, Record) for every record, sorted portion first and
+        then overflow, reading SCAN_CHUNK_RECORDS records per read call.
+        Deleted records are skipped unless includeDeleted is set. Records
+        still in the insert buffer are merged into the sorted portion in key
+        order and reported as BUFFERED_RECORD; the data file is not touched.
+        """
+        records: Iterator[Tuple[int, Record]] = self._scan_range(0, self.numRecords)
+        if not self._buffer_empty():
+            records = chain(self._merge_buffered(self._scan_range(0, self.numSortedRecords)),
+                            self._scan_range(self.numSortedRecords, self.numRecords))
+        for recno, r in records:
+            if not includeDeleted and self._is_deleted(r):
+                continue
+            if predicate is None or predicate(r):
+                yield (recno, r)
+
+    def _scan_range(self, start: int, end: int) -> Iterator[Tuple[int, Record]]:
+        # every record in [start, end), deleted ones included
+        for recno, buf in self._raw_chunks(start, end):
+            for i in range(len(buf) // self.recordSize):
+                yield (recno + i, self._unpack_record(buf[i * self.recordSize : (i + 1) * self.recordSize]))
+
+    def _raw_chunks(self, start: int, end: int) -> Iterator[Tuple[int, bytes]]:
+        """
+        Yields (first recordNum, bytes) chunks covering records [start, end).
+        Ranges larger than readaheadBytes are read by a background thread on
+        its own handle, one chunk ahead of the consumer; a chunk already
+        prefetched does not see writes the caller makes after it was read.
+        """
+        if not self.isOpen() or self.recordSize <= 0 or start >= end:
+            return
+
+        span = (end - start) * self.recordSize
+        if self.readaheadBytes > 0 and span > self.readaheadBytes:
+            self.dataFilestream.flush()
+            yield from _read_chunks(self._data_filename(self._prefix), start, end,
+                                    self.recordSize, self.readaheadBytes)
+            return
+
+        recno = start
+        while recno < end:
+            count = min(self.SCAN_CHUNK_RECORDS, end - recno)
+            # seek every chunk: callers may use the handle between yields
+            self.dataFilestream.seek(recno * self.recordSize)
+            buf = self.dataFilestream.read(count * self.recordSize)
+            count = len(buf) // self.recordSize
+            if count == 0:
+                return
+            yield (recno, buf[: count * self.recordSize])
+            recno += count
+
+    # -----------------------------
+    # public: page (cursor over all records in key order)
+    # -----------------------------
+    def _sorted_upper_bound(self, key: str) -> int:
+        # first sorted recordNum whose key is > key
+        if self.hasIndex:
+            return bisect_right(self._indexKeys, key, 0, self.numSortedRecords)
+        low, high = 0, self.numSortedRecords
+        while low < high:
+            mid = (low + high) // 2
+            if self._read_key(mid) <= key:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def _overflow_keys(self) -> List[Tuple[str, int]]:
+        # overwrites keep the stored key, so only appends invalidate this
+        if self._overflowKeysAt != self.numRecords:
+            if self.hasIndex:
+                keys = [(k, n) for k, n in self._indexOverflow.items()]
+            else:
+                keys = [(self._read_key(n), n) for n in range(self.numSortedRecords, self.numRecords)]
+            self._overflowKeys = sorted(keys)
+            self._overflowKeysAt = self.numRecords
+        return self._overflowKeys
+
+    def page(self, after_key: Optional[str] = None, limit: int = 10) -> List[Tuple[int, Record]]:
+        """
+        Returns up to limit live (recordNum, Record) pairs with keys after
+        after_key (None = from the start), sorted portion, insert buffer
+        (as BUFFERED_RECORD) and overflow merged in key order. Pass the last
+        name returned to get the next page; a page shorter than limit is the
+        last one.
+        Each page costs one bisect plus the records it returns, however deep
+        the cursor is.
+        """
+        if not self.isOpen() or limit <= 0:
+            return []
+
+        key = "" if after_key is None else after_key.strip().upper()
+        nSorted = self.numSortedRecords
+        i = self._sorted_upper_bound(key) if after_key is not None else 0
+        overflow = self._overflow_keys()
+        j = bisect_right(overflow, (key, self.numRecords)) if after_key is not None else 0
+
+        rows: List[Tuple[int, Record]] = []
+
+        def sorted_side() -> Iterator[Tuple[int, Record]]:
+            nonlocal i
+            while i < nSorted:
+                # refill with just enough sorted records for what is still missing
+                batch = list(self._scan_range(i, min(i + limit - len(rows), nSorted)))
+                if not batch:
+                    return
+                i += len(batch)
+                yield from batch
+
+        side = sorted_side()
+        if not self._buffer_empty():
+            side = self._merge_buffered(side, key if after_key is not None else None)
+        s, need = None, True
+        while len(rows) < limit:
+            if need:
+                s, need = next(side, None), False
+            o = overflow[j] if j < len(overflow) else None
+            if s is None and o is None:
+                break
+            if o is None or (s is not None and s[1].name.strip().upper() <= o[0]):
+                recno, r = s
+                need = True
+            else:
+                r = self._read_at(o[1])
+                recno = o[1]
+                j += 1
+                if r is None:
+                    continue
+            if not self._is_deleted(r):
+                rows.append((recno, r))
+        return rows
+
+    # -----------------------------
+    # public: topK (bounded heap over a numeric field)
+    # -----------------------------
+    @staticmethod
+    def _to_int(v: str) -> Optional[int]:
+        try:
+            return int(v.replace(",", ""))
+        except ValueError:
+            return None
+
+    def topK(self, field: str, k: int, ascending: bool = False) -> List[Tuple[int, Record]]:
+        """
+        Returns the k live records with the largest (or, with ascending,
+        smallest) integer value of field ("rank" or "employees"), as
+        (recordNum, Record) pairs best first; ties go to the lower
+        recordNum. Blank or non-numeric values are skipped.
+        Streams the field (column sidecar when built) through a size-k
+        heap, so memory is O(k) whatever the database size; records still
+        in the insert buffer take part as BUFFERED_RECORD.
+        """
+        if not self.isOpen() or field not in NUMERIC_FIELDS or k <= 0:
+            return []
+
+        # buffered records rank after every record in the file on ties and
+        # are fetched back by name
+        buffered = not self._buffer_empty()
+        names: Dict[int, str] = {}
+
+        def candidates() -> Iterator[Tuple[int, int]]:
+            seen = 0
+            for recno, vals in self.scanColumns([field, "name"] if buffered else [field]):
+                n = self._to_int(vals[0])
+                if recno == BUFFERED_RECORD:
+                    recno = self.numRecords + seen
+                    seen += 1
+                    if n is not None:
+                        names[recno] = vals[1]
+                if n is not None:
+                    yield (n, recno)
+
+        if ascending:
+            best = heapq.nsmallest(k, candidates())
+        else:
+            # largest value first, lowest recordNum breaks ties
+            best = [(n, recno) for n, recno in
+                    heapq.nsmallest(k, ((-n, recno) for n, recno in candidates()))]
+
+        out: List[Tuple[int, Record]] = []
+        for _, recno in best:
+            if recno in names:
+                r, recno = self._buffer_get(names[recno].strip().upper()), BUFFERED_RECORD
+            else:
+                r = self._read_at(recno)
+            if r is not None:
+                out.append((recno, r))
+        return out
+
+    # -----------------------------
+    # public: export (csv / jsonl / columnar)
+    # -----------------------------
+    EXPORT_BUFFER = 1024 * 1024
+
+    def export(self, format: str, path: str) -> bool:
+        """
+        Streams every live record (sorted portion, then overflow) to path.
+          csv       one CSV row per record, same column order as the input CSV
+          jsonl     one JSON object per line
+          columnar  path is a directory holding <field>.col (values padded to
+                    the field width, back to back) plus columns.config
+        Records are read with scan(), so memory stays bounded by one chunk.
+        """
+        if not self.isOpen():
+            return False
+
+        import csv
+        import json
+
+        fields = FIELDS
+        try:
+            if format == "csv":
+                with open(path, "w", encoding="utf-8", newline="", buffering=self.EXPORT_BUFFER) as f:
+                    writer = csv.writer(f)
+                    for _, r in self.scan():
+                        writer.writerow([r.name, r.rank, r.city, r.state, r.zip, r.employees])
+
+            elif format == "jsonl":
+                with open(path, "w", encoding="utf-8", newline="\n", buffering=self.EXPORT_BUFFER) as f:
+                    for _, r in self.scan():
+                        f.write(json.dumps({k: getattr(r, k) for k in fields}, ensure_ascii=False))
+                        f.write("\n")
+
+            elif format == "columnar":
+                os.makedirs(path, exist_ok=True)
+                outs = {k: open(os.path.join(path, f"{k}.col"), "wb", buffering=self.EXPORT_BUFFER) for k in fields}
+                count = 0
+                try:
+                    for _, r in self.scan():
+                        for k in fields:
+                            outs[k].write(_pack_field(getattr(r, k), self._widths[k]))
+                        count += 1
+                finally:
+                    for f in outs.values():
+                        f.close()
+                with open(os.path.join(path, "columns.config"), "w", encoding="utf-8", newline="\n") as f:
+                    f.write(f"numRecords={count}\n")
+                    f.write("widths=" + ",".join(str(self._widths[k]) for k in fields) + "\n")
+
+            else:
+                return False
+            return True
+        except Exception:
+            return False
+
+    # -----------------------------
+    # public: alterWidths (online schema change)
+    # -----------------------------
+    @staticmethod
+    def _count_truncated(r: Record, w: Dict[str, int]) -> int:
+        return sum(1 for k in FIELDS if len(getattr(r, k).encode("utf-8", errors="replace")) > w[k])
+
+    def _repack_record(self, b: bytes, w: Dict[str, int], record_size: int) -> Tuple[bytes, int]:
+        # fields are re-sliced as raw bytes; only non-ASCII records in the
+        # old character layout go through a full decode / pack
+        if self._charLayout and not b.isascii():
+            r = self._unpack_record(b)
+            return (_pack_fields(r, w, record_size), self._count_truncated(r, w))
+        out = []
+        cut = 0
+        i = self._keyWidth
+        for k in FIELDS:
+            v = b[i : i + self._widths[k]].rstrip()
+            i += self._widths[k]
+            if len(v) > w[k]:
+                cut += 1
+                v = _cut_utf8(v, w[k])
+            out.append(v.ljust(w[k]))
+        out.append(b"\n")
+        return (b"".join(out), cut)
+
+    def alterWidths(self, new_widths: Dict[str, int],
+                    allowTruncation: bool = False) -> Tuple[bool, int]:
+        """
+        Rewrites the data file into new field widths in one streaming
+        chunked pass. Record numbers, the sorted/overflow split and deleted
+        records are preserved, except that a sorted portion whose cut names
+        fall out of order is re-sorted. Files in the old character layout
+        come out in the byte layout, so alterWidths({}, allowTruncation=True)
+        converts one in place; values longer than their field in bytes are
+        cut on a character boundary. The new file is written beside the old
+        one and swapped in with a rename only at the end; if any value would
+        be cut short and allowTruncation is False, the new file is discarded
+        instead.
+        Returns (status, number of truncated values).
+        """
+        if not self._writable():
+            return (False, 0)
+        # runs and the memlog are packed in the old widths: fold them in first
+        if self.hasInsertBuffer and not self.mergeInsertBuffer():
+            return (False, 0)
+        w = dict(self._widths)
+        w.update(new_widths)
+        if set(w) != set(FIELDS) or any(v <= 0 for v in w.values()):
+            return (False, 0)
+
+        record_size = _record_size_for(w)
+        data_path = self._data_filename(self._prefix)
+        tmp = data_path + ".alter-tmp"
+        truncated = 0
+        # names can only be cut (and so fall out of order) if they shrink
+        # or come from the character layout
+        check_order = w["name"] < self._widths["name"] or self._charLayout
+        prev, ordered = "", True
+        try:
+            with open(tmp, "wb", buffering=INGEST_WRITE_BUFFER) as outf:
+                for recno, buf in self._raw_chunks(0, self.numRecords):
+                    block = []
+                    for i in range(len(buf) // self.recordSize):
+                        b, cut = self._repack_record(buf[i * self.recordSize : (i + 1) * self.recordSize], w, record_size)
+                        if check_order and recno + i < self.numSortedRecords:
+                            key = _packed_key(b, w["name"])
+                            ordered = ordered and prev <= key
+                            prev = key
+                        block.append(b)
+                        truncated += cut
+                    outf.write(b"".join(block))
+        except Exception:
+            truncated = -1
+        if truncated != 0 and (truncated < 0 or not allowTruncation):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return (False, max(truncated, 0))
+        if not ordered:
+            _sort_data_file(tmp, w, record_size, self.numSortedRecords)
+
+        self._swap_data_file(tmp)
+        self._widths = w
+        self.recordSize = record_size
+        self._charLayout = False
+        # zone maps hold values, not offsets: unless something was cut short
+        # they only need the new file's fingerprint
+        self._rebuild_sidecars(keepZones=truncated == 0)
+        return (True, truncated)
+
+    def _swap_data_file(self, tmp: str) -> None:
+        # snapshots keep reading the old file through their own handles; it
+        # is never written again, so they no longer need copy-on-write
+        with self._snapshotLock:
+            self._snapshots.clear()
+
+        data_path = self._data_filename(self._prefix)
+        self.dataFilestream.close()
+        os.replace(tmp, data_path)
+        self.dataFilestream = open(data_path, "r+b")
+
+    def _rebuild_sidecars(self, keepZones: bool = False) -> None:
+        # after a rewrite every record number may have moved
+        self._write_config(self._prefix)
+        if self._cache is not None:
+            self._cache.clear()
+        if self.hasIndex:
+            self._build_index()
+        if self.hasColumns:
+            self.buildColumns()
+        if self.hasChecksums:
+            self.buildChecksums()
+        if self.hasZones and keepZones and self._zones:
+            self._save_zones()
+        elif self.hasZones:
+            self.buildZoneMaps()
+
+    # -----------------------------
+    # public: snapshot (consistent read view)
+    # -----------------------------
+    def snapshot(self) -> Optional["Snapshot"]:
+        """
+        Returns a read-only view pinned to the current record count.
+        Records overwritten after this call are served from the snapshot's
+        version side-table, so scans see one consistent state while writers
+        carry on. Close the snapshot when done to stop collecting versions.
+        The view covers the data file: records still in the insert buffer
+        are not part of it until mergeInsertBuffer() compacts them.
+        """
+        if not self.isOpen():
+            return None
+        self.dataFilestream.flush()
+        snap = Snapshot(self)
+        with self._snapshotLock:
+            self._snapshots.add(snap)
+        return snap
+
+    # -----------------------------
+    # record cache (optional)
+    # -----------------------------
+    def enableCache(self, maxEntries: int = 1024) -> None:
+        """Puts a bounded LRU RecordCache in front of findRecord/readRecord."""
+        self._cache = RecordCache(maxEntries)
+
+    def disableCache(self) -> None:
+        self._cache = None
+
+    def cacheStats(self) -> Dict[str, Any]:
+        return self._cache.stats() if self._cache is not None else {}
+
+    # -----------------------------
+    # in-memory key index (optional, persisted as <prefix>.idx)
+    # -----------------------------
+    INDEX_VERSION = 1
+    INDEX_HEADER_SIZE = 512
+
+    def _database_files(self, prefix: str) -> List[str]:
+        # data, config and every sidecar that currently exists for prefix
+        paths = [
+            self._data_filename(prefix), self._config_filename(prefix),
+            self._index_filename(prefix), self._zones_filename(prefix),
+            self._crc_filename(prefix), self._memlog_filename(prefix),
+        ]
+        paths += [self._column_filename(prefix, f) for f in FIELDS + ("live",)]
+        # run files are numbered: find them in the directory
+        folder, base = os.path.split(prefix)
+        try:
+            names = os.listdir(folder or ".")
+        except OSError:
+            names = []
+        stem = base + ".run"
+        paths += [os.path.join(folder, n) for n in names if n.startswith(stem) and n[len(stem):].isdigit()]
+        return [p for p in paths if os.path.exists(p)]
+
+    def _remove_files(self, prefix: str) -> None:
+        for p in self._database_files(prefix):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def _index_filename(self, prefix: str) -> str:
+        return f"{prefix}.idx"
+
+    def _data_fingerprint(self) -> Dict[str, int]:
+        self.dataFilestream.flush()
+        return _file_fingerprint(self._data_filename(self._prefix))
+
+    def _build_index(self) -> None:
+        self._release_index()
+        keys: List[str] = []
+        overflow: Dict[str, int] = {}
+        for recno, r in self._scan_range(0, self.numRecords):
+            key = r.name.strip().upper()
+            if recno < self.numSortedRecords:
+                keys.append(key)
+            else:
+                # first occurrence wins, same as _linearSearch
+                overflow.setdefault(key, recno)
+        self._indexKeys = keys
+        self._indexOverflow = overflow
+        self._indexDirty = True
+        self.hasIndex = True
+
+    def _index_write(self, recordNum: int, r: Record) -> None:
+        key = r.name.strip().upper()
+        self._indexDirty = True
+        if recordNum >= self.numSortedRecords:
+            self._indexOverflow.setdefault(key, recordNum)
+        elif self._indexKeys[recordNum] != key:
+            # a raw writeRecord renamed a sorted slot: materialize and patch
+            if not isinstance(self._indexKeys, list):
+                self._indexKeys = list(self._indexKeys)
+                self._release_index_map()
+            self._indexKeys[recordNum] = key
+
+    def _save_index(self) -> None:
+        if not self._indexDirty:
+            return
+        keys = self._indexKeys
+        if isinstance(keys, _MappedKeys):
+            # sorted keys never changed: copy the key block straight across
+            keyWidth = keys._width
+            keyBlock = keys._mm[keys._start : keys._start + keyWidth * len(keys)]
+        else:
+            encoded = [k.encode("utf-8") for k in keys]
+            keyWidth = max([len(k) for k in encoded] + [1])
+            keyBlock = b"".join(k.ljust(keyWidth, b" ") for k in encoded)
+        overflow = "".join(f"{n}\t{k}\n" for k, n in sorted(self._indexOverflow.items(), key=lambda kv: kv[1]))
+        header = {
+            "version": self.INDEX_VERSION,
+            "keyWidth": keyWidth,
+            "numSortedRecords": self.numSortedRecords,
+            "numUnsortedRecords": self.numUnsortedRecords,
+            "recordSize": self.recordSize,
+            **self._data_fingerprint(),
+        }
+        head = (" ".join(f"{k}={v}" for k, v in header.items()) + "\n").encode("ascii")
+
+        path = self._index_filename(self._prefix)
+        tmp = path + ".tmp"
+        with open(tmp, "wb", buffering=self.EXPORT_BUFFER) as f:
+            f.write(head.ljust(self.INDEX_HEADER_SIZE, b" "))
+            f.write(keyBlock)
+            f.write(overflow.encode("utf-8"))
+        self._release_index()
+        os.replace(tmp, path)
+
+    def _load_index(self) -> bool:
+        path = self._index_filename(self._prefix)
+        try:
+            fh = open(path, "rb")
+        except OSError:
+            return False
+        try:
+            head = fh.read(self.INDEX_HEADER_SIZE).decode("ascii").split()
+            h = {k: int(v) for k, v in (kv.split("=", 1) for kv in head)}
+            expect = {
+                "version": self.INDEX_VERSION,
+                "numSortedRecords": self.numSortedRecords,
+                "numUnsortedRecords": self.numUnsortedRecords,
+                "recordSize": self.recordSize,
+                **self._data_fingerprint(),
+            }
+            if any(h.get(k) != v for k, v in expect.items()):
+                fh.close()
+                return False
+
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            start = self.INDEX_HEADER_SIZE
+            end = start + h["keyWidth"] * self.numSortedRecords
+            overflow: Dict[str, int] = {}
+            for line in mm[end:].decode("utf-8").splitlines():
+                n, k = line.split("\t", 1)
+                overflow[k] = int(n)
+        except Exception:
+            fh.close()
+            return False
+
+        self._indexFile, self._indexMap = fh, mm
+        self._indexKeys = _MappedKeys(mm, start, h["keyWidth"], self.numSortedRecords)
+        self._indexOverflow = overflow
+        self._indexDirty = False
+        self.hasIndex = True
+        return True
+
+    def _release_index_map(self) -> None:
+        if isinstance(self._indexKeys, _MappedKeys):
+            self._indexKeys = list(self._indexKeys)
+        if self._indexMap is not None:
+            self._indexMap.close()
+        if self._indexFile is not None:
+            self._indexFile.close()
+        self._indexMap = None
+        self._indexFile = None
+
+    def _release_index(self) -> None:
+        if self._indexMap is not None:
+            self._indexMap.close()
+        if self._indexFile is not None:
+            self._indexFile.close()
+        self._indexMap = None
+        self._indexFile = None
+        self._indexKeys = None
+        self._indexOverflow = {}
+
+    def buildIndex(self) -> bool:
+        """
+        Builds the in-memory key index (sorted key array + overflow map) and
+        turns it on for this database (config key index=1). close() saves it
+        to <prefix>.idx; open() memory-maps that file when it still matches
+        the data file and rebuilds only when it is stale (read-only handles
+        go without the index instead).
+        """
+        if not self._writable():
+            return False
+        self._build_index()
+        self._write_config(self._prefix)
+        return True
+
+    def dropIndex(self) -> None:
+        self._release_index()
+        if self.hasIndex and self._prefix is not None:
+            self.hasIndex = False
+            self._write_config(self._prefix)
+            try:
+                os.remove(self._index_filename(self._prefix))
+            except OSError:
+                pass
+        self.hasIndex = False
+
+    # -----------------------------
+    # LSM-style insert buffer (optional): memtable + sorted runs
+    # -----------------------------
+    def _memlog_filename(self, prefix: str) -> str:
+        return f"{prefix}.memlog"
+
+    def _run_filename(self, prefix: str, runId: int) -> str:
+        return f"{prefix}.run{runId}"
+
+    def _open_insert_buffer(self) -> bool:
+        runs: List[_Run] = []
+        try:
+            for runId in self._runIds:
+                runs.append(_Run(self._run_filename(self._prefix, runId), runId, self.recordSize, self._widths["name"]))
+            path = self._memlog_filename(self._prefix)
+            if self.readOnly:
+                self._memlog = open(path, "rb") if os.path.isfile(path) else None
+            else:
+                self._memlog = open(path, "a+b")
+        except OSError:
+            for run in runs:
+                run.close()
+            return False
+        self._runs = runs
+
+        # replay inserts that never made it into a run; a torn last record is dropped
+        self._memtable = {}
+        if self._memlog is not None:
+            self._memlog.seek(0)
+            raw = self._memlog.read()
+            whole = len(raw) // self.recordSize * self.recordSize
+            for i in range(0, whole, self.recordSize):
+                r = self._unpack_record(raw[i : i + self.recordSize])
+                self._memtable[r.name.strip().upper()] = r
+            if whole != len(raw) and not self.readOnly:
+                self._memlog.truncate(whole)
+        return True
+
+    def _close_insert_buffer(self) -> None:
+        with self._runLock:
+            runs, self._runs = self._runs + self._retiredRuns, []
+            self._retiredRuns = []
+        for run in runs:
+            run.close()
+        if self._memlog is not None:
+            try:
+                self._memlog.close()
+            except Exception:
+                pass
+        self._memlog = None
+        self._memtable = {}
+        self._mergeThread = None
+
+    def _buffer_get(self, key: str) -> Optional[Record]:
+        # memtable, then runs newest first; the first hit is the live version
+        r = self._memtable.get(key)
+        if r is not None:
+            return r
+        for run in reversed(self._runs):
+            b = run.find(key)
+            if b is not None:
+                return self._unpack_record(b)
+        return None
+
+    def _buffer_put(self, r: Record) -> bool:
+        try:
+            b = self._pack_record(r)
+            self._memlog.write(b)
+            self._memlog.flush()
+            self._memtable[r.name.strip().upper()] = self._unpack_record(b)
+            if len(self._memtable) >= self.memtableLimit:
+                self._flush_memtable()
+            self._reap_runs()
+            return True
+        except Exception:
+            return False
+
+    def _buffered(self, after: Optional[str] = None) -> Iterator[Tuple[str, Record]]:
+        """
+        The insert buffer in key order as (key, Record), newest version of
+        each key only (deleted ones included), keys > after if given: a
+        k-way merge of the memtable and the runs newest first.
+        """
+        if not self.hasInsertBuffer:
+            return
+        memtable = sorted((k, r) for k, r in self._memtable.items() if after is None or k > after)
+        with self._runLock:
+            runs = list(self._runs)
+        if not runs:
+            yield from memtable
+            return
+        sources = [iter([(k, self._pack_record(r)) for k, r in memtable])]
+        sources += [run.records(after) for run in reversed(runs)]
+        for k, b in _newest_first_merge(sources):
+            yield (k, self._unpack_record(b))
+
+    def _buffer_empty(self) -> bool:
+        return not self.hasInsertBuffer or (not self._memtable and not self._runs)
+
+    def _merge_buffered(self, base: Iterator[Tuple[int, Record]],
+                        after: Optional[str] = None) -> Iterator[Tuple[int, Record]]:
+        # key-ordered base records (the sorted portion) merged with the
+        # insert buffer; a buffered record replaces base records with its
+        # key, as mergeInsertBuffer would, and comes out as BUFFERED_RECORD
+        buffered = self._buffered(after)
+        b = next(buffered, None)
+        for recno, r in base:
+            key = r.name.strip().upper()
+            while b is not None and b[0] < key:
+                yield (BUFFERED_RECORD, b[1])
+                b = next(buffered, None)
+            if b is not None and b[0] == key:
+                continue
+            yield (recno, r)
+        while b is not None:
+            yield (BUFFERED_RECORD, b[1])
+            b = next(buffered, None)
+
+    def _shadowed(self) -> Tuple[set, List[Record]]:
+        # (sorted recordNums replaced by a buffered record, buffered records
+        # in key order) for readers that go by record number
+        buffered = [r for _, r in self._buffered()]
+        keys = [r.name.strip().upper() for r in buffered]
+        n = self.numSortedRecords
+        if self.hasIndex:
+            first = [(k, bisect_left(self._indexKeys, k, 0, n)) for k in keys]
+        else:
+            first = [(k, recno) for k, (recno, _) in self._gallop(keys).items()]
+        hits = set()
+        for k, i in first:
+            # duplicates of a key sit next to each other
+            while i < n and self._read_key(i) == k:
+                hits.add(i)
+                i += 1
+        return (hits, buffered)
+
+    def _flush_memtable(self) -> None:
+        # memtable -> new sorted run; listed in the config before the log is
+        # cleared, so a crash in between only replays inserts already in a run
+        if not self._memtable:
+            return
+        with self._runLock:
+            runId = self._nextRun
+            self._nextRun += 1
+        path = self._run_filename(self._prefix, runId)
+        with open(path + ".tmp", "wb", buffering=INGEST_WRITE_BUFFER) as outf:
+            for _, r in sorted(self._memtable.items()):
+                outf.write(self._pack_record(r))
+        os.replace(path + ".tmp", path)
+        run = _Run(path, runId, self.recordSize, self._widths["name"])
+        with self._runLock:
+            self._runs = self._runs + [run]
+        self._write_config(self._prefix)
+        self._memlog.seek(0)
+        self._memlog.truncate()
+        self._memtable = {}
+        if len(self._runs) >= RUN_MERGE_FANIN:
+            self._start_merge()
+
+    def _start_merge(self) -> None:
+        if self._mergeThread is not None and self._mergeThread.is_alive():
+            return
+        with self._runLock:
+            victims = list(self._runs)
+            runId = self._nextRun
+            self._nextRun += 1
+        self._mergeThread = threading.Thread(
+            target=self._merge_runs, args=(victims, runId), name="db-run-merge", daemon=True
+        )
+        self._mergeThread.start()
+
+    def _merge_runs(self, victims: List["_Run"], runId: int) -> None:
+        # background thread: victims are immutable, and new runs are only
+        # ever appended, so they stay a prefix of self._runs until the swap
+        path = self._run_filename(self._prefix, runId)
+        try:
+            with open(path + ".tmp", "wb", buffering=INGEST_WRITE_BUFFER) as outf:
+                for _, b in _newest_first_merge([run.records() for run in reversed(victims)]):
+                    outf.write(b)
+            os.replace(path + ".tmp", path)
+            merged = _Run(path, runId, self.recordSize, self._widths["name"])
+        except Exception:
+            try:
+                os.remove(path + ".tmp")
+            except OSError:
+                pass
+            return
+        with self._runLock:
+            self._runs = [merged] + self._runs[len(victims):]
+            self._retiredRuns.extend(victims)
+
+    def _wait_merge(self) -> None:
+        if self._mergeThread is not None:
+            self._mergeThread.join()
+            self._mergeThread = None
+
+    def _reap_runs(self) -> None:
+        # drop runs a finished merge replaced: config first, then the files
+        if not self._retiredRuns:
+            return
+        self._write_config(self._prefix)
+        with self._runLock:
+            retired, self._retiredRuns = self._retiredRuns, []
+        for run in retired:
+            run.close()
+            try:
+                os.remove(run.path)
+            except OSError:
+                pass
+
+    def enableInsertBuffer(self, memtableLimit: Optional[int] = None) -> bool:
+        """
+        Switches addRecord to the buffered write path: inserts land in a
+        memtable (and an append-only <prefix>.memlog for crash recovery),
+        every memtableLimit (default MEMTABLE_RECORDS) inserts become one
+        sorted run file, and once RUN_MERGE_FANIN runs pile up a background
+        thread merges them.
+        findRecord(s), updateRecord(s) and deleteRecord(s) check the
+        memtable, then the runs newest first, then the base file. Scans,
+        page, topK, export and join merge the buffer in as they read. Either
+        way buffered records have no record number yet and are reported as
+        BUFFERED_RECORD. The data file and its sidecars only change when
+        mergeInsertBuffer() compacts the buffer into them.
+        """
+        if not self._writable() or self.fileFormat != "current":
+            return False
+        self.memtableLimit = max(1, memtableLimit or MEMTABLE_RECORDS)
+        if not self.hasInsertBuffer:
+            self.hasInsertBuffer = True
+            self._runIds = []
+            if not self._open_insert_buffer():
+                self.hasInsertBuffer = False
+                return False
+            self._write_config(self._prefix)
+        return True
+
+    def disableInsertBuffer(self) -> bool:
+        """Folds the buffer into the base file and returns to plain appends."""
+        if not self.hasInsertBuffer:
+            return True
+        if not self.mergeInsertBuffer():
+            return False
+        self._close_insert_buffer()
+        self.hasInsertBuffer = False
+        self._write_config(self._prefix)
+        try:
+            os.remove(self._memlog_filename(self._prefix))
+        except OSError:
+            pass
+        return True
+
+    def mergeInsertBuffer(self) -> bool:
+        """
+        Compaction: rewrites the data file with the memtable and every run
+        merged into the sorted portion (a buffered record replaces a sorted
+        record with the same key; the overflow is copied as is), then clears
+        the buffer and rebuilds the sidecars.
+        """
+        if not self._writable():
+            return False
+        if not self.hasInsertBuffer:
+            return True
+        self._wait_merge()
+        self._reap_runs()
+        if not self._memtable and not self._runs:
+            return True
+
+        kw, nw = self._keyWidth, self._widths["name"]
+
+        def base() -> Iterator[Tuple[str, bytes]]:
+            for _, buf in self._raw_chunks(0, self.numSortedRecords):
+                for i in range(0, len(buf), self.recordSize):
+                    b = buf[i : i + self.recordSize]
+                    yield (b[kw : kw + nw].decode("utf-8", errors="replace").strip().upper(), b)
+
+        memtable = [(k, self._pack_record(r)) for k, r in sorted(self._memtable.items())]
+        sources = [iter(memtable)] + [run.records() for run in reversed(self._runs)] + [base()]
+
+        data_path = self._data_filename(self._prefix)
+        tmp = data_path + ".merge-tmp"
+        numSorted = 0
+        try:
+            with open(tmp, "wb", buffering=INGEST_WRITE_BUFFER) as outf:
+                for _, b in _newest_first_merge(sources):
+                    outf.write(b)
+                    numSorted += 1
+                for _, buf in self._raw_chunks(self.numSortedRecords, self.numRecords):
+                    outf.write(buf)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+
+        self._swap_data_file(tmp)
+        self.numSortedRecords = numSorted
+        self.numRecords = self.numSortedRecords + self.numUnsortedRecords
+        with self._runLock:
+            runs, self._runs = self._runs, []
+        self._memtable = {}
+        self._rebuild_sidecars()
+        self._memlog.seek(0)
+        self._memlog.truncate()
+        for run in runs:
+            run.close()
+            try:
+                os.remove(run.path)
+            except OSError:
+                pass
+        return True
+
+    def insertBufferStats(self) -> Dict[str, Any]:
+        if not self.hasInsertBuffer:
+            return {}
+        with self._runLock:
+            runs = [run.count for run in self._runs]
+        return {
+            "memtable": len(self._memtable),
+            "runs": runs,
+            "merging": self._mergeThread is not None and self._mergeThread.is_alive(),
+        }
+
+    # -----------------------------
+    # zone maps (<prefix>.zones) and filtered scans
+    # -----------------------------
+    def _zones_filename(self, prefix: str) -> str:
+        return f"{prefix}.zones"
+
+    def _load_zones(self) -> bool:
+        import json
+
+        try:
+            with open(self._zones_filename(self._prefix), "r", encoding="utf-8") as f:
+                head = json.loads(f.readline())
+                zones = [json.loads(line) for line in f]
+        except (OSError, ValueError):
+            return False
+        expect = {"version": ZONE_VERSION, "blockRecords": ZONE_BLOCK_RECORDS, **self._data_fingerprint()}
+        if any(head.get(k) != v for k, v in expect.items()):
+            return False
+        if len(zones) != -(-self.numRecords // ZONE_BLOCK_RECORDS):
+            return False
+        self._zones = zones
+        self._zonesDirty = False
+        return True
+
+    def _build_zones(self) -> None:
+        zones = _ZoneBuilder()
+        for _, r in self._scan_range(0, self.numRecords):
+            if self._is_deleted(r):
+                zones.add("", "", "")
+            else:
+                zones.add(r.rank, r.employees, r.state)
+        self._zones = zones.zones
+        self._zonesDirty = True
+        self.hasZones = True
+
+    def _save_zones(self) -> None:
+        _write_zone_file(self._zones_filename(self._prefix), self._zones, self._data_fingerprint())
+        self._zonesDirty = False
+
+    def buildZoneMaps(self) -> bool:
+        """
+        (Re)builds the zone maps in one sequential pass, dropping any widening
+        left behind by updates and deletes. create_database_from_csv builds
+        them already; writes keep them conservative and close() saves them.
+        """
+        if not self._writable():
+            return False
+        self._build_zones()
+        self._save_zones()
+        self._write_config(self._prefix)
+        return True
+
+    SCAN_OPS = ("==", "!=", "<", "<=", ">", ">=", "in")
+
+    def scanWhere(self, conditions: Iterable[Tuple[str, str, Any]],
+                  includeDeleted: bool = False) -> Iterator[Tuple[int, Record]]:
+        """
+        Yields (recordNum, Record) for records matching every (field, op,
+        value) condition, e.g. [("employees", ">", 100000), ("state", "==", "TX")].
+        rank/employees compare as integers (blank or non-numeric values never
+        match); other fields compare as strings; "in" takes a collection.
+        With zone maps, blocks that cannot match are skipped without being
+        read; zoneStats then holds {"blocks", "skipped", "scanned"}. Matching
+        records still in the insert buffer come last, as BUFFERED_RECORD.
+        """
+        conds = []
+        for field, op, value in conditions:
+            if field not in self._widths or op not in self.SCAN_OPS:
+                raise ValueError(f"bad condition: {field} {op} {value!r}")
+            if field in NUMERIC_FIELDS:
+                value = [int(v) for v in value] if op == "in" else int(value)
+            else:
+                value = [str(v) for v in value] if op == "in" else str(value)
+            conds.append((field, op, value))
+
+        def matches(r: Record) -> bool:
+            for field, op, value in conds:
+                v = getattr(r, field)
+                if field in NUMERIC_FIELDS:
+                    v = self._to_int(v)
+                    if v is None:
+                        return False
+                if op == "in":
+                    if v not in value:
+                        return False
+                elif not {"==": v == value, "!=": v != value, "<": v < value,
+                          "<=": v <= value, ">": v > value, ">=": v >= value}[op]:
+                    return False
+            return True
+
+        if not self.isOpen():
+            return
+
+        shadowed, buffered = self._shadowed() if not self._buffer_empty() else (set(), [])
+        n = self.numRecords
+        if self.hasZones and not self._zones and n > 0 and not self._load_zones():
+            # read-only opens load them on first use
+            self._build_zones()
+        if self.hasZones and not includeDeleted:
+            blocks = -(-n // ZONE_BLOCK_RECORDS)
+            keep = [
+                b >= len(self._zones) or all(_zone_may_match(self._zones[b], f, o, v) for f, o, v in conds)
+                for b in range(blocks)
+            ]
+        else:
+            blocks = -(-n // ZONE_BLOCK_RECORDS) if n > 0 else 0
+            keep = [True] * blocks
+        self.zoneStats = {"blocks": blocks, "skipped": keep.count(False), "scanned": keep.count(True)}
+
+        # read each run of consecutive surviving blocks as one range
+        b = 0
+        while b < blocks:
+            if not keep[b]:
+                b += 1
+                continue
+            e = b
+            while e + 1 < blocks and keep[e + 1]:
+                e += 1
+            start, end = b * ZONE_BLOCK_RECORDS, min((e + 1) * ZONE_BLOCK_RECORDS, n)
+            for recno, r in self._scan_range(start, end):
+                if not includeDeleted and self._is_deleted(r):
+                    continue
+                if recno not in shadowed and matches(r):
+                    yield (recno, r)
+            b = e + 1
+
+        # zone maps cover the data file only; the buffer is checked record by record
+        for r in buffered:
+            if (includeDeleted or not self._is_deleted(r)) and matches(r):
+                yield (BUFFERED_RECORD, r)
+
+    # -----------------------------
+    # per-block checksums (optional, <prefix>.crc)
+    # -----------------------------
+    def _crc_filename(self, prefix: str) -> str:
+        return f"{prefix}.crc"
+
+    def _num_blocks(self) -> int:
+        return -(-self.numRecords // CRC_BLOCK_RECORDS)
+
+    def _block_crc(self, block: int) -> int:
+        first = block * CRC_BLOCK_RECORDS
+        count = min(CRC_BLOCK_RECORDS, self.numRecords - first)
+        self.dataFilestream.seek(first * self.recordSize)
+        return zlib.crc32(self.dataFilestream.read(count * self.recordSize))
+
+    def _load_checksums(self) -> bool:
+        path = self._crc_filename(self._prefix)
+        try:
+            with open(path, "rb") as f:
+                crcs = array.array("I")
+                crcs.frombytes(f.read())
+        except (OSError, ValueError):
+            return False
+        if crcs.itemsize != 4:
+            return False
+        self._crcs = crcs
+        self._crcFile = open(path, "rb" if self.readOnly else "r+b")
+        n = self._num_blocks()
+        if len(crcs) != n:
+            # appends landed after the last checksum write: recompute the
+            # last block we had plus everything after it
+            del crcs[n:]
+            self._crcDirty.update(range(max(0, len(crcs) - 1), n))
+            if not self.readOnly:
+                self._flush_checksums()
+        return True
+
+    def _flush_checksums(self) -> None:
+        if not self.hasChecksums or not self._crcDirty:
+            return
+        self.dataFilestream.flush()
+        n = self._num_blocks()
+        if len(self._crcs) < n:
+            self._crcs.extend([0] * (n - len(self._crcs)))
+        for block in sorted(self._crcDirty):
+            if block < n:
+                self._crcs[block] = self._block_crc(block)
+                self._crcFile.seek(block * 4)
+                self._crcFile.write(self._crcs[block : block + 1].tobytes())
+        self._crcFile.flush()
+        self._crcDirty.clear()
+
+    def _close_checksums(self) -> None:
+        if self._crcFile is not None:
+            try:
+                self._crcFile.close()
+            except Exception:
+                pass
+        self._crcFile = None
+        self._crcs = array.array("I")
+        self._crcDirty = set()
+
+    def buildChecksums(self) -> bool:
+        """
+        Computes a CRC32 for every block of CRC_BLOCK_RECORDS records and
+        stores them in <prefix>.crc (config key checksums=1). Writes keep
+        the affected blocks' checksums current; verify() re-checks them.
+        """
+        if not self._writable():
+            return False
+        self._close_checksums()
+        crcs = array.array("I")
+        crc = 0
+        for recno, buf in self._raw_chunks(0, self.numRecords):
+            # chunks are whole records but need not line up with blocks:
+            # carry a running CRC across chunk boundaries
+            off = 0
+            while off < len(buf):
+                in_block = (recno + off // self.recordSize) % CRC_BLOCK_RECORDS
+                take = min(len(buf) - off, (CRC_BLOCK_RECORDS - in_block) * self.recordSize)
+                crc = zlib.crc32(buf[off : off + take], crc)
+                off += take
+                if (recno + off // self.recordSize) % CRC_BLOCK_RECORDS == 0:
+                    crcs.append(crc)
+                    crc = 0
+        if len(crcs) < self._num_blocks():
+            crcs.append(crc)
+        path = self._crc_filename(self._prefix)
+        with open(path, "wb") as f:
+            f.write(crcs.tobytes())
+        self._crcs = crcs
+        self._crcFile = open(path, "r+b")
+        self.hasChecksums = True
+        self._write_config(self._prefix)
+        return True
+
+    def verify(self, workers: Optional[int] = None) -> Tuple[bool, List[Tuple[int, int]]]:
+        """
+        Re-reads the data file and compares every block against <prefix>.crc,
+        splitting the blocks across a process pool. Returns (status,
+        [(firstRecord, lastRecord), ...]) with adjacent corrupt blocks merged;
+        status is False when checksums were never built or any block fails.
+        """
+        if not self.isOpen() or not self.hasChecksums:
+            return (False, [])
+        if not self.readOnly:
+            self._flush_checksums()
+        self.dataFilestream.flush()
+
+        n = self._num_blocks()
+        workers = workers or os.cpu_count() or 1
+        per_task = max(1, -(-n // (workers * 4)))
+        tasks = [
+            (self._data_filename(self._prefix), self.recordSize, self.numRecords, first,
+             self._crcs[first : first + per_task].tobytes())
+            for first in range(0, n, per_task)
+        ]
+        bad: List[int] = []
+        if workers > 1 and len(tasks) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for found in pool.map(_verify_blocks, tasks):
+                    bad.extend(found)
+        else:
+            for t in tasks:
+                bad.extend(_verify_blocks(t))
+
+        ranges: List[Tuple[int, int]] = []
+        for block in bad:
+            first = block * CRC_BLOCK_RECORDS
+            last = min(first + CRC_BLOCK_RECORDS, self.numRecords) - 1
+            if ranges and ranges[-1][1] == first - 1:
+                ranges[-1] = (ranges[-1][0], last)
+            else:
+                ranges.append((first, last))
+        return (not ranges, ranges)
+
+    # -----------------------------
+    # columnar sidecars (optional)
+    # -----------------------------
+    def _column_filename(self, prefix: str, field: str) -> str:
+        return f"{prefix}.{field}.col"
+
+    def _column_width(self, field: str) -> int:
+        # "live" is a one-byte flag column so projections can skip deleted rows
+        return 1 if field == "live" else self._widths[field]
+
+    def _open_columns(self) -> bool:
+        self._close_columns()
+        try:
+            for f in FIELDS + ("live",):
+                path = self._column_filename(self._prefix, f)
+                if os.path.getsize(path) != self.numRecords * self._column_width(f):
+                    self._close_columns()
+                    return False
+                self._columnFiles[f] = open(path, "rb" if self.readOnly else "r+b")
+            return True
+        except OSError:
+            self._close_columns()
+            return False
+
+    def _close_columns(self) -> None:
+        for fh in self._columnFiles.values():
+            try:
+                fh.close()
+            except Exception:
+                pass
+        self._columnFiles = {}
+
+    def _columns_write(self, recordNum: int, r: Record) -> None:
+        for f in FIELDS:
+            fh = self._columnFiles[f]
+            fh.seek(recordNum * self._widths[f])
+            fh.write(_pack_field(getattr(r, f), self._widths[f]))
+        fh = self._columnFiles["live"]
+        fh.seek(recordNum)
+        fh.write(b"0" if self._is_deleted(r) else b"1")
+        # one flush per column file, after every column has been written
+        for fh in self._columnFiles.values():
+            fh.flush()
+
+    def buildColumns(self) -> bool:
+        """
+        (Re)builds the column sidecars from the row file in one sequential
+        pass. Once built they are kept in sync by every write and reopened
+        automatically (config key columns=1).
+        """
+        if not self._writable():
+            return False
+
+        self._close_columns()
+        self.hasColumns = False
+        outs = {f: open(self._column_filename(self._prefix, f), "wb", buffering=self.EXPORT_BUFFER)
+                for f in FIELDS + ("live",)}
+        try:
+            for _, r in self.scan(includeDeleted=True):
+                for f in FIELDS:
+                    outs[f].write(_pack_field(getattr(r, f), self._widths[f]))
+                outs["live"].write(b"0" if self._is_deleted(r) else b"1")
+        finally:
+            for fh in outs.values():
+                fh.close()
+
+        self.hasColumns = self._open_columns()
+        if self.hasColumns:
+            self._write_config(self._prefix)
+        return self.hasColumns
+
+    def dropColumns(self) -> None:
+        self._close_columns()
+        if self.hasColumns and self._prefix is not None:
+            self.hasColumns = False
+            self._write_config(self._prefix)
+            for f in FIELDS + ("live",):
+                try:
+                    os.remove(self._column_filename(self._prefix, f))
+                except OSError:
+                    pass
+        self.hasColumns = False
+
+    def scanColumns(self, fields: Iterable[str],
+                    predicate: Optional[Callable[..., bool]] = None,
+                    includeDeleted: bool = False) -> Iterator[Tuple[int, Tuple[str, ...]]]:
+        """
+        Projection scan: yields (recordNum, (value, ...)) for the requested
+        fields only. With sidecars built, only those column files (and the
+        one-byte live column) are read, memory-mapped; otherwise this falls
+        back to a full row scan. predicate, if given, receives the values.
+        Records still in the insert buffer come as BUFFERED_RECORD.
+        """
+        fields = tuple(fields)
+        if not self.isOpen() or any(f not in self._widths for f in fields):
+            return
+
+        if not self.hasColumns:
+            for recno, r in self.scan(includeDeleted=includeDeleted):
+                vals = tuple(getattr(r, f) for f in fields)
+                if predicate is None or predicate(*vals):
+                    yield (recno, vals)
+            return
+
+        # the sidecars cover the data file only: sorted records a buffered
+        # record replaces are skipped and the buffer comes last
+        shadowed, buffered = self._shadowed() if not self._buffer_empty() else (set(), [])
+        n = self.numRecords
+        maps = {}
+        try:
+            for f in fields + ("live",):
+                maps[f] = mmap.mmap(self._columnFiles[f].fileno(), 0, access=mmap.ACCESS_READ) if n > 0 else None
+            live = maps["live"]
+            cols = [(maps[f], self._widths[f]) for f in fields]
+            for recno in range(n):
+                if not includeDeleted and live[recno] != 0x31:  # b"1"
+                    continue
+                if recno in shadowed:
+                    continue
+                vals = tuple(
+                    m[recno * w : (recno + 1) * w].decode("utf-8", errors="replace").rstrip()
+                    for m, w in cols
+                )
+                if predicate is None or predicate(*vals):
+                    yield (recno, vals)
+        finally:
+            for m in maps.values():
+                if m is not None:
+                    m.close()
+        for r in buffered:
+            if not includeDeleted and self._is_deleted(r):
+                continue
+            vals = tuple(getattr(r, f) for f in fields)
+            if predicate is None or predicate(*vals):
+                yield (BUFFERED_RECORD, vals)
+
+
+FINGERPRINT_TAIL_BYTES = 64 * 1024
+
+
+def _file_fingerprint(path: str) -> Dict[str, int]:
+    # size + mtime + CRC of the file's tail (where appends land); cheap
+    # enough to check on every open without reading the whole file
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        f.seek(max(0, st.st_size - FINGERPRINT_TAIL_BYTES))
+        crc = zlib.crc32(f.read(FINGERPRINT_TAIL_BYTES))
+    return {"dataSize": st.st_size, "dataMtime": st.st_mtime_ns, "dataCrc": crc}
+
+
+# -----------------------------
+# Zone maps
+# -----------------------------
+ZONE_BLOCK_RECORDS = 1024
+ZONE_MAX_STATES = 16
+ZONE_VERSION = 1
+
+
+def _new_zone() -> Dict[str, Any]:
+    # numeric fields: [min, max] or None (no numeric value seen);
+    # state: list of values seen, or None once there are too many to track
+    return {"rank": None, "employees": None, "state": []}
+
+
+def _zone_add(zone: Dict[str, Any], rank: str, employees: str, state: str) -> None:
+    for f, v in (("rank", rank), ("employees", employees)):
+        n = DB._to_int(v)
+        if n is not None:
+            mm = zone[f]
+            zone[f] = [n, n] if mm is None else [min(mm[0], n), max(mm[1], n)]
+    states = zone["state"]
+    if states is not None and state and state not in states:
+        states.append(state)
+        if len(states) > ZONE_MAX_STATES:
+            zone["state"] = None
+
+
+def _zone_may_match(zone: Dict[str, Any], field: str, op: str, value: Any) -> bool:
+    # False only when no record in the block can satisfy field <op> value
+    if field in NUMERIC_FIELDS:
+        mm = zone[field]
+        if mm is None:
+            return False
+        lo, hi = mm
+        return {
+            "==": lo <= value <= hi,
+            "!=": not (lo == hi == value),
+            "<": lo < value,
+            "<=": lo <= value,
+            ">": hi > value,
+            ">=": hi >= value,
+        }.get(op, True)
+    if field == "state" and zone["state"] is not None:
+        if op == "==":
+            return value in zone["state"]
+        if op == "in":
+            return any(v in zone["state"] for v in value)
+    return True
+
+
+def _write_zone_file(path: str, zones: List[Dict[str, Any]], fingerprint: Dict[str, int]) -> None:
+    import json
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        f.write(json.dumps({"version": ZONE_VERSION, "blockRecords": ZONE_BLOCK_RECORDS, **fingerprint}) + "\n")
+        for z in zones:
+            f.write(json.dumps(z) + "\n")
+    os.replace(tmp, path)
+
+
+class _ZoneBuilder:
+    """Accumulates zone maps for records appended in order from record 0."""
+
+    def __init__(self):
+        self.zones: List[Dict[str, Any]] = []
+        self.count = 0
+
+    def add(self, rank: str, employees: str, state: str) -> None:
+        if self.count % ZONE_BLOCK_RECORDS == 0:
+            self.zones.append(_new_zone())
+        _zone_add(self.zones[-1], rank, employees, state)
+        self.count += 1
+
+
+# -----------------------------
+# Insert buffer runs
+# -----------------------------
+MEMTABLE_RECORDS = 4096
+RUN_MERGE_FANIN = 4
+BUFFERED_RECORD = -2  # recordNum reported for records still in the insert buffer
+
+
+class _Run:
+    """
+    One immutable sorted run file of an insert buffer: fixed-width records in
+    the DB's current layout, one per key, in key order. Reads use pread so a
+    merge thread and lookups can share it.
+    """
+
+    def __init__(self, path: str, runId: int, recordSize: int, nameWidth: int):
+        self.path = path
+        self.runId = runId
+        self.recordSize = recordSize
+        self.nameWidth = nameWidth
+        self._fd = os.open(path, os.O_RDONLY)
+        self.count = os.fstat(self._fd).st_size // recordSize
+
+    def _key(self, i: int) -> str:
+        return os.pread(self._fd, self.nameWidth, i * self.recordSize).decode("utf-8", errors="replace").strip().upper()
+
+    def _bound(self, key: str, right: bool = False) -> int:
+        # first index whose key is >= key (> key with right)
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            k = self._key(mid)
+            if k < key or (right and k == key):
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def find(self, key: str) -> Optional[bytes]:
+        i = self._bound(key)
+        if i < self.count and self._key(i) == key:
+            return os.pread(self._fd, self.recordSize, i * self.recordSize)
+        return None
+
+    def records(self, after: Optional[str] = None) -> Iterator[Tuple[str, bytes]]:
+        # (key, record bytes) in key order, only keys > after if given
+        step = max(1, READAHEAD_BYTES // self.recordSize)
+        first = 0 if after is None else self._bound(after, right=True)
+        for start in range(first, self.count, step):
+            buf = os.pread(self._fd, step * self.recordSize, start * self.recordSize)
+            for i in range(0, len(buf) - self.recordSize + 1, self.recordSize):
+                b = buf[i : i + self.recordSize]
+                yield (b[: self.nameWidth].decode("utf-8", errors="replace").strip().upper(), b)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def _newest_first_merge(sources: List[Iterator[Tuple[str, bytes]]]) -> Iterator[Tuple[str, bytes]]:
+    # k-way merge of key-ordered (key, record bytes) streams, newest source
+    # first; each key is emitted once, from the newest source that has it
+    def tag(age: int, src: Iterator[Tuple[str, bytes]]) -> Iterator[Tuple[str, int, bytes]]:
+        for k, b in src:
+            yield (k, age, b)
+
+    last = None
+    for k, _, b in heapq.merge(*(tag(age, src) for age, src in enumerate(sources))):
+        if k != last:
+            last = k
+            yield (k, b)
+
+
+# -----------------------------
+# Block checksums
+# -----------------------------
+CRC_BLOCK_RECORDS = 256
+
+
+def _verify_blocks(args: Tuple[str, int, int, int, bytes]) -> List[int]:
+    # process-pool worker: recompute a run of block CRCs, return the bad ones
+    path, record_size, num_records, first_block, expected_bytes = args
+    expected = array.array("I")
+    expected.frombytes(expected_bytes)
+    per_block = CRC_BLOCK_RECORDS * record_size
+    bad: List[int] = []
+    with open(path, "rb") as f:
+        f.seek(first_block * per_block)
+        for i, crc in enumerate(expected):
+            block = first_block + i
+            count = min(CRC_BLOCK_RECORDS, num_records - block * CRC_BLOCK_RECORDS)
+            buf = f.read(count * record_size)
+            if len(buf) != count * record_size or zlib.crc32(buf) != crc:
+                bad.append(block)
+    return bad
+
+
+# -----------------------------
+# Background readahead for sequential scans
+# -----------------------------
+READAHEAD_BYTES = 1024 * 1024
+READAHEAD_DEPTH = 2
+
+
+def _read_chunks(source: Any, start: int, end: int, record_size: int,
+                 chunk_bytes: int, background: bool = True,
+                 depth: int = READAHEAD_DEPTH) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yields (first recordNum, bytes) for records [start, end) in chunks of
+    about chunk_bytes (whole records). source is a path (read through a
+    private handle) or an open binary file, which is read with os.pread
+    when available so its position is left alone, and seeked otherwise.
+    With background=True a reader thread keeps up to depth chunks queued,
+    so the next read is in flight while the caller decodes the current one.
+    """
+    per_chunk = max(1, chunk_bytes // record_size)
+
+    def chunks(f) -> Iterator[Tuple[int, bytes]]:
+        recno = start
+        fd = f.fileno() if hasattr(os, "pread") else None
+        while recno < end:
+            count = min(per_chunk, end - recno)
+            if fd is not None:
+                buf = os.pread(fd, count * record_size, recno * record_size)
+            else:
+                f.seek(recno * record_size)
+                buf = f.read(count * record_size)
+            count = len(buf) // record_size
+            if count == 0:
+                return
+            yield (recno, buf[: count * record_size])
+            recno += count
+
+    def opened():
+        # only close handles we opened ourselves
+        return open(source, "rb", buffering=0) if isinstance(source, str) else _NoClose(source)
+
+    if not background or (not isinstance(source, str) and not hasattr(os, "pread")):
+        with opened() as f:
+            yield from chunks(f)
+        return
+
+    q: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        # never block for good: the consumer may have stopped reading
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def reader() -> None:
+        try:
+            with opened() as f:
+                for item in chunks(f):
+                    if not put(item):
+                        return
+        except Exception as e:
+            put(e)
+            return
+        put(None)
+
+    t = threading.Thread(target=reader, name="db-readahead", daemon=True)
+    t.start()
+    try:
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # consumer stopped early (break / close): let the reader exit
+        stop.set()
+        t.join()
+
+
+class _NoClose:
+    def __init__(self, f: Any):
+        self._f = f
+
+    def __enter__(self) -> Any:
+        return self._f
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+class _MappedKeys:
+    """Read-only sequence view of the fixed-width key array in a .idx mmap."""
+
+    def __init__(self, mm: mmap.mmap, start: int, width: int, count: int):
+        self._mm = mm
+        self._start = start
+        self._width = width
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        off = self._start + i * self._width
+        return self._mm[off : off + self._width].decode("utf-8").rstrip(" ")
+
+
+class Snapshot:
+    """
+    Point-in-time read view of a DB, created by DB.snapshot().
+    Reads go through a private file handle; _versions maps recordNum to the
+    record bytes as they were when the snapshot was taken, filled in by the
+    DB just before it overwrites them.
+    """
+
+    def __init__(self, db: DB):
+        self._db = db
+        # own copy of the layout, so the snapshot outlives DB.alterWidths
+        self._widths = dict(db._widths)
+        self._keyWidth = db._keyWidth
+        self._charLayout = db._charLayout
+        self.numSortedRecords = db.numSortedRecords
+        self.numRecords = db.numRecords
+        self.recordSize = db.recordSize
+        self._versions: Dict[int, bytes] = {}
+        self._fh = open(db._data_filename(db._prefix), "rb")
+
+    def isOpen(self) -> bool:
+        return self._fh is not None and not self._fh.closed
+
+    def close(self) -> None:
+        with self._db._snapshotLock:
+            self._db._snapshots.discard(self)
+        if self._fh is not None:
+            self._fh.close()
+        self._fh = None
+        self._versions = {}
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _read_raw(self, recordNum: int, count: int = 1) -> bytes:
+        self._fh.seek(recordNum * self.recordSize)
+        return self._patch(recordNum, self._fh.read(count * self.recordSize))
+
+    def _patch(self, recordNum: int, buf: bytes) -> bytes:
+        # patch after reading: a version saved before a concurrent overwrite
+        # always wins over whatever bytes we happened to read
+        count = len(buf) // self.recordSize
+        if self._versions:
+            with self._db._snapshotLock:
+                hits = [(n, v) for n, v in self._versions.items() if recordNum <= n < recordNum + count]
+            if hits:
+                b = bytearray(buf)
+                for n, v in hits:
+                    off = (n - recordNum) * self.recordSize
+                    b[off : off + self.recordSize] = v
+                buf = bytes(b)
+        return buf
+
+    def readRecord(self, recordNum: int) -> Tuple[bool, Optional[Record]]:
+        if not self.isOpen() or not (0 <= recordNum < self.numRecords):
+            return (False, None)
+        b = self._read_raw(recordNum)
+        if len(b) != self.recordSize:
+            return (False, None)
+        return (True, DB._unpack_record(self, b))
+
+    def findRecord(self, name: str, record: Optional[Record] = None) -> int:
+        """Binary search of the pinned sorted portion, then the pinned overflow."""
+        if not self.isOpen():
+            return -1
+        target = (name or "").strip().upper()
+
+        found: Tuple[int, Optional[Record]] = (-1, None)
+        low, high = 0, self.numSortedRecords - 1
+        while low <= high:
+            mid = (low + high) // 2
+            ok, r = self.readRecord(mid)
+            if not ok or r is None:
+                break
+            mid_name = r.name.strip().upper()
+            if mid_name == target:
+                found = (mid, r)
+                break
+            elif mid_name < target:
+                low = mid + 1
+            else:
+                high = mid - 1
+
+        if found[0] == -1:
+            for recno, r in self.scan(includeDeleted=True, start=self.numSortedRecords):
+                if r.name.strip().upper() == target:
+                    found = (recno, r)
+                    break
+
+        recno, r = found
+        if recno != -1 and isinstance(record, Record):
+            record.name, record.rank, record.city, record.state, record.zip, record.employees = (
+                r.name, r.rank, r.city, r.state, r.zip, r.employees
+            )
+        return recno
+
+    def scan(self, predicate: Optional[Callable[[Record], bool]] = None,
+             includeDeleted: bool = False, start: int = 0) -> Iterator[Tuple[int, Record]]:
+        """Same as DB.scan, but over the snapshot's pinned records."""
+        if not self.isOpen() or start >= self.numRecords:
+            return
+        # read through our own handle: after DB.alterWidths the path names a
+        # different file than the one this snapshot pinned
+        readahead = self._db.readaheadBytes
+        chunks = _read_chunks(self._fh, start, self.numRecords, self.recordSize,
+                              readahead or DB.SCAN_CHUNK_RECORDS * self.recordSize,
+                              background=readahead > 0)
+        for recno, buf in chunks:
+            buf = self._patch(recno, buf)
+            for i in range(len(buf) // self.recordSize):
+                r = DB._unpack_record(self, buf[i * self.recordSize : (i + 1) * self.recordSize])
+                if not includeDeleted and DB._is_deleted(r):
+                    continue
+                if predicate is None or predicate(r):
+                    yield (recno + i, r)
+
+
+def _cut_utf8(b: bytes, width: int) -> bytes:
+    # longest prefix of at most width bytes that ends on a character boundary
+    if len(b) <= width:
+        return b
+    while width > 0 and b[width] & 0xC0 == 0x80:
+        width -= 1
+    return b[:width]
+
+
+def _pack_field(v: str, width: int) -> bytes:
+    # UTF-8 bytes, truncated on a character boundary and space padded, so a
+    # multi-byte character never spills into the next field
+    return _cut_utf8(v.encode("utf-8", errors="replace"), width).ljust(width)
+
+
+# -----------------------------
+# Joins on the name key
+# -----------------------------
+JOIN_KINDS = ("inner", "left", "anti")
+
+
+def _live_groups(records: Iterator[Tuple[int, Record]]) -> Iterator[Tuple[str, List[Record]]]:
+    # (key, live records with that key) in the order given; over the sorted
+    # portion that is key order, so each group holds every record for its key
+    for key, grp in groupby(
+        (r for _, r in records if not DB._is_deleted(r)),
+        key=lambda r: r.name.strip().upper(),
+    ):
+        yield (key, list(grp))
+
+
+def _sorted_side(db: DB) -> Iterator[Tuple[int, Record]]:
+    # the sorted portion with the insert buffer merged in, in key order
+    base = db._scan_range(0, db.numSortedRecords)
+    return base if db._buffer_empty() else db._merge_buffered(base)
+
+
+def _live_overflow(db: DB) -> Dict[str, List[Record]]:
+    out: Dict[str, List[Record]] = {}
+    for key, grp in _live_groups(db._scan_range(db.numSortedRecords, db.numRecords)):
+        out.setdefault(key, []).extend(grp)
+    return out
+
+
+def join(left: DB, right: DB, how: str = "inner") -> Iterator[Tuple[Record, Optional[Record]]]:
+    """
+    Joins two open DBs on the name key and yields (leftRecord, rightRecord)
+    pairs; rightRecord is None for unmatched left records in a "left" join
+    and always None in an "anti" join (left records with no match).
+    The sorted portions (with any insert buffer merged in) are merged in
+    one sequential pass over each file; overflow records on either side go
+    through hash tables, so memory is bounded by the overflow size, not the
+    table size. Pairs come in key order for the left sorted portion, then
+    for the left overflow.
+    """
+    if how not in JOIN_KINDS:
+        raise ValueError(f"unknown join kind: {how}")
+    if not left.isOpen() or not right.isOpen():
+        return
+
+    rightOverflow = _live_overflow(right)
+    leftOverflow = _live_overflow(left)
+    # right sorted records whose key only exists in the left overflow
+    leftOverflowHits: Dict[str, List[Record]] = {}
+
+    def emit(lrecs: List[Record], matches: List[Record]) -> Iterator[Tuple[Record, Optional[Record]]]:
+        for l in lrecs:
+            if how == "anti":
+                if not matches:
+                    yield (l, None)
+            elif matches:
+                for r in matches:
+                    yield (l, r)
+            elif how == "left":
+                yield (l, None)
+
+    rgroups = _live_groups(_sorted_side(right))
+    rg = next(rgroups, None)
+    for key, lrecs in _live_groups(_sorted_side(left)):
+        while rg is not None and rg[0] < key:
+            if rg[0] in leftOverflow:
+                leftOverflowHits.setdefault(rg[0], []).extend(rg[1])
+            rg = next(rgroups, None)
+        matches: List[Record] = []
+        if rg is not None and rg[0] == key:
+            matches = list(rg[1])
+            if key in leftOverflow:
+                leftOverflowHits.setdefault(key, []).extend(rg[1])
+            rg = next(rgroups, None)
+        matches.extend(rightOverflow.get(key, ()))
+        yield from emit(lrecs, matches)
+
+    # right sorted keys past the last left sorted key
+    while rg is not None:
+        if rg[0] in leftOverflow:
+            leftOverflowHits.setdefault(rg[0], []).extend(rg[1])
+        rg = next(rgroups, None)
+
+    for key, lrecs in leftOverflow.items():
+        yield from emit(lrecs, leftOverflowHits.get(key, []) + rightOverflow.get(key, []))
+
+
+# -----------------------------
+# Legacy formats (Database.py / Database_Part1.py)
+# -----------------------------
+PART1_KEY_WIDTH = 10
+PART1_WIDTHS = {"name": 40, "rank": 6, "city": 20, "state": 5, "zip": 10, "employees": 10}
+
+# Database.py: ID(10) EXPERIENCE(5) MARRIAGE(5) WAGE(20) INDUSTRY(30) + "\n", no config
+DB71_RECORD_SIZE = 71
+DB71_FIELDS = (("id", 10), ("experience", 5), ("marriage", 5), ("wage", 20), ("industry", 30))
+
+LEGACY_CHUNK_BYTES = 1024 * 1024
+
+
+def detect_format(prefix: str) -> str:
+    """
+    Returns "current" (key=value config), "part1" (two-line numeric config
+    from Database_Part1.py), "db71" (config-less 71-byte records from
+    Database.py), or "" if the files match none of them.
+    """
+    cfg = f"{prefix}.config"
+    data = f"{prefix}.data"
+    if os.path.isfile(cfg):
+        try:
+            with open(cfg, "r", encoding="utf-8") as f:
+                lines = [line.strip() for line in f if line.strip()]
+        except (OSError, UnicodeDecodeError):
+            return ""
+        if any(line.startswith("numSortedRecords=") for line in lines):
+            return "current"
+        if len(lines) == 2 and all(line.isdigit() for line in lines):
+            return "part1"
+        return ""
+
+    if os.path.isfile(data):
+        size = os.path.getsize(data)
+        if size > 0 and size % DB71_RECORD_SIZE == 0:
+            with open(data, "rb") as f:
+                first = f.read(DB71_RECORD_SIZE)
+            if first.endswith(b"\n") and b"\n" not in first[:-1]:
+                return "db71"
+    return ""
+
+
+def read_legacy_records(prefix: str, chunk_bytes: int = LEGACY_CHUNK_BYTES) -> Iterator[Dict[str, str]]:
+    """
+    Streams the records of a legacy database as dicts of stripped fields,
+    reading whole chunks of records at a time:
+      part1  KEY, NAME, RANK, CITY, STATE, ZIP, EMPLOYEES
+      db71   id, experience, marriage, wage, industry
+    """
+    fmt = detect_format(prefix)
+    if fmt == "part1":
+        db = DB()
+        if not db._read_part1_config(prefix):
+            return
+        size = db.recordSize
+        layout = [("KEY", PART1_KEY_WIDTH)] + [(k.upper(), v) for k, v in PART1_WIDTHS.items()]
+    elif fmt == "db71":
+        size = DB71_RECORD_SIZE
+        layout = list(DB71_FIELDS)
+    else:
+        return
+
+    per_chunk = max(1, chunk_bytes // size)
+    with open(f"{prefix}.data", "rb") as f:
+        while True:
+            buf = f.read(per_chunk * size)
+            if not buf:
+                return
+            for off in range(0, len(buf) - size + 1, size):
+                s = buf[off : off + size].decode("utf-8", errors="replace")
+                out: Dict[str, str] = {}
+                i = 0
+                for field, w in layout:
+                    out[field] = s[i : i + w].strip()
+                    i += w
+                yield out
+
+
+def convert_legacy_database(prefix: str,
+                            new_prefix: Optional[str] = None,
+                            widths: Optional[Dict[str, int]] = None,
+                            chunk_bytes: int = LEGACY_CHUNK_BYTES) -> bool:
+    """
+    Rewrites a Database_Part1 database into the current layout without a
+    CSV round trip: legacy records are read in chunk_bytes blocks, repacked
+    and written through one large buffer. With new_prefix=None the files
+    are replaced in place (written beside the originals, then renamed).
+    Database.py (db71) files hold a different schema and are not converted.
+    """
+    if detect_format(prefix) != "part1":
+        return False
+
+    w = widths or _default_widths()
+    record_size = _record_size_for(w)
+    target = new_prefix or prefix
+    tmp = f"{target}.convert-tmp"
+
+    num_records = 0
+    prev, ordered = "", True
+    with open(f"{tmp}.data", "wb", buffering=INGEST_WRITE_BUFFER) as outf:
+        for row in read_legacy_records(prefix, chunk_bytes):
+            r = Record(row["NAME"], row["RANK"], row["CITY"], row["STATE"], row["ZIP"], row["EMPLOYEES"])
+            b = _pack_fields(r, w, record_size)
+            key = _packed_key(b, w["name"])
+            ordered = ordered and prev <= key
+            prev = key
+            outf.write(b)
+            num_records += 1
+    if not ordered:
+        _sort_data_file(f"{tmp}.data", w, record_size)
+    _write_new_config(f"{tmp}.config", num_records, record_size, w)
+
+    os.replace(f"{tmp}.data", f"{target}.data")
+    os.replace(f"{tmp}.config", f"{target}.config")
+    return True
+
 
 # -----------------------------
 # Create new database (menu option 1)
@@ -421,12 +2912,32 @@ def create_database_from_csv(prefix: str,
       <prefix>.config
     Assumes CSV rows are already sorted by company name.
     """
+    import csv
+
     csv_path = csv_filename or f"{prefix}.csv"
     if not os.path.isfile(csv_path):
         return False
 
-    # Use default widths unless provided
-    w = widths or {
+    with open(csv_path, newline="", encoding="utf-8") as inf:
+        return create_database_from_records(prefix, _records_from_csv_rows(csv.reader(inf)), widths)
+
+
+def _records_from_csv_rows(rows: Iterable[List[str]]) -> Iterator[Record]:
+    for row in rows:
+        if len(row) < 6:
+            continue
+        yield Record(
+            name=row[0].strip(),
+            rank=row[1].strip(),
+            city=row[2].strip(),
+            state=row[3].strip(),
+            zip=row[4].strip(),
+            employees=row[5].strip(),
+        )
+
+
+def _default_widths() -> Dict[str, int]:
+    return {
         "name": 40,
         "rank": 4,
         "city": 20,
@@ -434,57 +2945,294 @@ def create_database_from_csv(prefix: str,
         "zip": 10,
         "employees": 10,
     }
-    record_size = w["name"] + w["rank"] + w["city"] + w["state"] + w["zip"] + w["employees"] + 1
 
-    data_path = f"{prefix}.data"
-    cfg_path = f"{prefix}.config"
 
-    # overwrite if exists
-    for p in (data_path, cfg_path):
-        try:
-            if os.path.exists(p):
-                os.remove(p)
-        except Exception:
-            pass
+def _record_size_for(w: Dict[str, int]) -> int:
+    return w["name"] + w["rank"] + w["city"] + w["state"] + w["zip"] + w["employees"] + 1
 
-    num_records = 0
-    with open(csv_path, newline="", encoding="utf-8") as inf, open(data_path, "wb") as outf:
-        reader = csv.reader(inf)
-        for row in reader:
-            if len(row) < 6:
-                continue
-            r = Record(
-                name=row[0].strip(),
-                rank=row[1].strip(),
-                city=row[2].strip(),
-                state=row[3].strip(),
-                zip=row[4].strip(),
-                employees=row[5].strip(),
-            )
-            s = (
-                f"{r.name:<{w['name']}.{w['name']}}"
-                f"{r.rank:<{w['rank']}.{w['rank']}}"
-                f"{r.city:<{w['city']}.{w['city']}}"
-                f"{r.state:<{w['state']}.{w['state']}}"
-                f"{r.zip:<{w['zip']}.{w['zip']}}"
-                f"{r.employees:<{w['employees']}.{w['employees']}}"
-                "\n"
-            )
-            b = s.encode("utf-8", errors="replace")
-            # enforce size
-            if len(b) < record_size:
-                b = b[:-1] + (b" " * (record_size - len(b))) + b"\n"
-            elif len(b) > record_size:
-                b = b[: record_size - 1] + b"\n"
 
-            outf.write(b)
-            num_records += 1
+def _pack_fields(r: Record, w: Dict[str, int], record_size: int) -> bytes:
+    # byte layout (config layout=bytes): each field is exactly w[field] bytes
+    b = b"".join((
+        _pack_field(r.name, w["name"]),
+        _pack_field(r.rank, w["rank"]),
+        _pack_field(r.city, w["city"]),
+        _pack_field(r.state, w["state"]),
+        _pack_field(r.zip, w["zip"]),
+        _pack_field(r.employees, w["employees"]),
+    ))
+    return b.ljust(record_size - 1) + b"\n"
+
 
-    # write config
+def _packed_key(b: bytes, nw: int) -> str:
+    # the key a packed record is searched by: its name field as stored
+    return b[:nw].decode("utf-8", errors="replace").strip().upper()
+
+
+def _sort_data_file(path: str, w: Dict[str, int], record_size: int,
+                    num_sorted: Optional[int] = None) -> _ZoneBuilder:
+    """
+    Rewrites a freshly packed data file in key order and returns its zone
+    maps. Input sorted by full name is not always sorted once names are cut
+    to the name width: with a 38-byte prefix p, p+"é" keeps its last
+    character but p+"日" does not, so p+"日" is stored as p and belongs first.
+    Creates fall back to this (holding the file in memory) only when they
+    see a stored key smaller than the one before it. With num_sorted, only
+    that many leading records are sorted and the overflow stays as it is.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    rows = [data[i : i + record_size] for i in range(0, len(data) - record_size + 1, record_size)]
+    n = len(rows) if num_sorted is None else num_sorted
+    # stable: ties keep input order
+    rows[:n] = sorted(rows[:n], key=lambda b: _packed_key(b, w["name"]))
+    zones = _ZoneBuilder()
+    for b in rows:
+        r = _unpack_fields(b, w, 0)
+        zones.add(r.rank, r.employees, r.state)
+    with open(path, "wb", buffering=INGEST_WRITE_BUFFER) as f:
+        f.write(b"".join(rows))
+    return zones
+
+
+def _pack_fields_chars(r: Record, w: Dict[str, int], record_size: int) -> bytes:
+    # old character layout: fields padded/truncated by characters, then the
+    # whole record forced to record_size bytes
+    s = (
+        f"{r.name:<{w['name']}.{w['name']}}"
+        f"{r.rank:<{w['rank']}.{w['rank']}}"
+        f"{r.city:<{w['city']}.{w['city']}}"
+        f"{r.state:<{w['state']}.{w['state']}}"
+        f"{r.zip:<{w['zip']}.{w['zip']}}"
+        f"{r.employees:<{w['employees']}.{w['employees']}}"
+        "\n"
+    )
+    b = s.encode("utf-8", errors="replace")
+    # enforce size
+    if len(b) < record_size:
+        b = b[:-1] + (b" " * (record_size - len(b))) + b"\n"
+    elif len(b) > record_size:
+        b = b[: record_size - 1] + b"\n"
+    return b
+
+
+def _unpack_fields(b: bytes, w: Dict[str, int], keyWidth: int) -> Record:
+    # every field is its own byte range, cut on a character boundary when
+    # packed, so each one decodes on its own
+    i = keyWidth
+    j = i + w["name"]; name = b[i:j].rstrip().decode("utf-8", "replace"); i = j
+    j = i + w["rank"]; rank = b[i:j].rstrip().decode("utf-8", "replace"); i = j
+    j = i + w["city"]; city = b[i:j].rstrip().decode("utf-8", "replace"); i = j
+    j = i + w["state"]; state = b[i:j].rstrip().decode("utf-8", "replace"); i = j
+    j = i + w["zip"]; zipc = b[i:j].rstrip().decode("utf-8", "replace"); i = j
+    j = i + w["employees"]; emp = b[i:j].rstrip().decode("utf-8", "replace")
+    return Record(name, rank, city, state, zipc, emp)
+
+
+def _unpack_fields_chars(b: bytes, w: Dict[str, int], keyWidth: int) -> Record:
+    s = b.decode("utf-8", errors="replace")
+    # strip only final newline; keep padding for slicing
+    if s.endswith("\n"):
+        s = s[:-1]
+    i = keyWidth
+    name = s[i : i + w["name"]].rstrip(); i += w["name"]
+    rank = s[i : i + w["rank"]].rstrip(); i += w["rank"]
+    city = s[i : i + w["city"]].rstrip(); i += w["city"]
+    state = s[i : i + w["state"]].rstrip(); i += w["state"]
+    zipc = s[i : i + w["zip"]].rstrip(); i += w["zip"]
+    emp = s[i : i + w["employees"]].rstrip()
+    return Record(name, rank, city, state, zipc, emp)
+
+
+def _write_new_config(cfg_path: str, num_records: int, record_size: int, w: Dict[str, int],
+                      zonemaps: bool = False) -> None:
     with open(cfg_path, "w", encoding="utf-8", newline="\n") as f:
         f.write(f"numSortedRecords={num_records}\n")
         f.write("numUnsortedRecords=0\n")
         f.write(f"recordSize={record_size}\n")
         f.write("widths=" + ",".join(str(w[k]) for k in ("name","rank","city","state","zip","employees")) + "\n")
+        f.write("layout=bytes\n")
+        if zonemaps:
+            f.write("zonemaps=1\n")
+
+
+def _remove_database_files(prefix: str) -> None:
+    # overwrite if exists, sidecars included so none outlive the new data
+    DB()._remove_files(prefix)
+
 
+def create_database_from_records(prefix: str,
+                                 records: Iterable[Record],
+                                 widths: Optional[Dict[str, int]] = None) -> bool:
+    """
+    Writes <prefix>.data / <prefix>.config from an iterable of Records.
+    Records are written in the order given and all land in the sorted portion,
+    so the caller must supply them sorted by company name. If the names as
+    stored (cut to the name width in bytes) are out of order anyway, the
+    file is re-sorted on them before the config is written.
+    """
+    # Use default widths unless provided
+    w = widths or _default_widths()
+    record_size = _record_size_for(w)
+
+    _remove_database_files(prefix)
+
+    num_records = 0
+    zones = _ZoneBuilder()
+    prev, ordered = "", True
+    with open(f"{prefix}.data", "wb") as outf:
+        for r in records:
+            b = _pack_fields(r, w, record_size)
+            key = _packed_key(b, w["name"])
+            ordered = ordered and prev <= key
+            prev = key
+            outf.write(b)
+            zones.add(r.rank, r.employees, r.state)
+            num_records += 1
+    if not ordered:
+        zones = _sort_data_file(f"{prefix}.data", w, record_size)
+
+    _write_zone_file(f"{prefix}.zones", zones.zones, _file_fingerprint(f"{prefix}.data"))
+    _write_new_config(f"{prefix}.config", num_records, record_size, w, zonemaps=True)
+    return True
+
+
+# -----------------------------
+# Parallel CSV ingest
+# -----------------------------
+INGEST_CHUNK_BYTES = 16 * 1024 * 1024
+INGEST_WRITE_BUFFER = 8 * 1024 * 1024
+
+
+def _csv_chunk_bounds(csv_path: str, chunk_bytes: int) -> List[Tuple[int, int]]:
+    # cut the file roughly every chunk_bytes, moving each cut forward to the
+    # next newline so no row straddles two chunks
+    size = os.path.getsize(csv_path)
+    bounds: List[Tuple[int, int]] = []
+    with open(csv_path, "rb") as f:
+        start = 0
+        while start < size:
+            end = start + chunk_bytes
+            if end >= size:
+                end = size
+            else:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+
+def _pack_csv_chunk(args: Tuple[str, int, int, Dict[str, int], int]) \
+        -> Tuple[int, bytes, List[Tuple[str, str, str]], Tuple[str, str, bool]]:
+    # process-pool worker: parse one byte range of the CSV and return
+    # (record count, packed fixed-width block, zone map inputs per record,
+    # (first stored key, last stored key, whether the keys are in order))
+    import csv
+    import io
+
+    csv_path, start, end, w, record_size = args
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        raw = f.read(end - start)
+    # parse like the serial path (newline=""): str.splitlines() would also
+    # break rows on \x1c-\x1e, \x85, \u2028 and \u2029 inside a field
+    text = io.StringIO(raw.decode("utf-8"), newline="")
+    records = list(_records_from_csv_rows(csv.reader(text)))
+    block = [_pack_fields(r, w, record_size) for r in records]
+    keys = [_packed_key(b, w["name"]) for b in block]
+    order = (keys[0], keys[-1], all(a <= b for a, b in zip(keys, keys[1:]))) if keys else ("", "", True)
+    return (len(block), b"".join(block), [(r.rank, r.employees, r.state) for r in records], order)
+
+
+def create_database_from_csv_parallel(prefix: str,
+                                      csv_filename: Optional[str] = None,
+                                      widths: Optional[Dict[str, int]] = None,
+                                      workers: Optional[int] = None,
+                                      chunk_bytes: int = INGEST_CHUNK_BYTES) -> bool:
+    """
+    Same output as create_database_from_csv, but the CSV is split at line
+    boundaries into chunk_bytes pieces that a process pool parses and packs
+    into fixed-width blocks. Blocks are written back in input order (and
+    re-sorted, like create_database_from_records, if the stored names are
+    not) and the config is written once every block is on disk.
+    Rows must not contain quoted newlines (chunks are cut on raw newlines).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    csv_path = csv_filename or f"{prefix}.csv"
+    if not os.path.isfile(csv_path):
+        return False
+
+    w = widths or _default_widths()
+    record_size = _record_size_for(w)
+    bounds = _csv_chunk_bounds(csv_path, max(1, chunk_bytes))
+    workers = workers or os.cpu_count() or 1
+
+    _remove_database_files(prefix)
+
+    num_records = 0
+    zones = _ZoneBuilder()
+    prev, ordered = "", True
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            open(f"{prefix}.data", "wb", buffering=INGEST_WRITE_BUFFER) as outf:
+        # keep at most 2 chunks per worker in flight to bound memory
+        pending = []
+        jobs = iter(bounds)
+        for start, end in jobs:
+            pending.append(pool.submit(_pack_csv_chunk, (csv_path, start, end, w, record_size)))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            count, block, zone_values, (first, last, chunk_ordered) = pending.pop(0).result()
+            if count:
+                ordered = ordered and chunk_ordered and prev <= first
+                prev = last
+            outf.write(block)
+            for v in zone_values:
+                zones.add(*v)
+            num_records += count
+            nxt = next(jobs, None)
+            if nxt is not None:
+                pending.append(pool.submit(_pack_csv_chunk, (csv_path, nxt[0], nxt[1], w, record_size)))
+    if not ordered:
+        zones = _sort_data_file(f"{prefix}.data", w, record_size)
+
+    _write_zone_file(f"{prefix}.zones", zones.zones, _file_fingerprint(f"{prefix}.data"))
+    _write_new_config(f"{prefix}.config", num_records, record_size, w, zonemaps=True)
     return True
+
+
+# -----------------------------
+# Command line: one-shot lookups
+# -----------------------------
+# python -m Database_new find <prefix> <name>
+#   prints "recordNum<TAB>name<TAB>rank<TAB>city<TAB>state<TAB>zip<TAB>employees"
+#   and exits 0, or exits 1 if the name is not present (2 on usage/open errors)
+def main(argv: Optional[List[str]] = None) -> int:
+    import sys
+
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 3 or args[0] != "find":
+        print("usage: python -m Database_new find <prefix> <name>", file=sys.stderr)
+        return 2
+
+    _, prefix, name = args
+    db = DB()
+    if not db.open(prefix, readOnly=True):
+        print(f"cannot open {prefix}", file=sys.stderr)
+        return 2
+    try:
+        r = Record()
+        recno = db.findRecord(name, record=r)
+    finally:
+        db.close()
+    if recno == -1:
+        return 1
+    print("\t".join([str(recno)] + [getattr(r, f) for f in FIELDS]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
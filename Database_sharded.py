@@ -0,0 +1,403 @@
+import csv
+import os
+import queue
+import threading
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Optional, Tuple, Dict, List, Callable, Iterator
+
+from Database_new import DB, Record, create_database_from_records, _records_from_csv_rows
+
+
+def _norm(name: str) -> str:
+    # same key normalization DB._binarySearch uses
+    return (name or "").strip().upper()
+
+
+class ShardedDB:
+    """
+    Key-range sharded database made of several Database_new.DB shards:
+      <prefix>.manifest            (text)
+      <prefix>.shard<N>.config/.data  one DB per shard
+    Shard i owns every key k with lowKeys[i] <= k < lowKeys[i+1]
+    (keys normalized with strip().upper(); lowKeys[0] is always "").
+    """
+
+    # -----------------------------
+    # default constructor
+    # -----------------------------
+    def __init__(self):
+        self.shards: List[DB] = []
+        self.shardPrefixes: List[str] = []
+        self.lowKeys: List[str] = []
+        self.nextShardId = 0
+
+        # per-shard op counters, used to spot hot shards
+        self.shardHits: List[int] = []
+
+        # one lock per shard (a DB owns a single file handle) plus a lock
+        # protecting the routing table itself
+        self._shardLocks: List[threading.RLock] = []
+        self._routeLock = threading.RLock()
+
+        self._prefix: Optional[str] = None
+
+    # -----------------------------
+    # helpers for manifest
+    # -----------------------------
+    def _manifest_filename(self, prefix: str) -> str:
+        return f"{prefix}.manifest"
+
+    def _shard_path(self, shardPrefix: str) -> str:
+        # shard prefixes in the manifest are relative to the manifest's directory
+        return os.path.join(os.path.dirname(self._prefix or ""), shardPrefix)
+
+    def _write_manifest(self, prefix: str) -> None:
+        # write-then-rename so a reader never sees a half-written routing table
+        path = self._manifest_filename(prefix)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            f.write(f"numShards={len(self.shardPrefixes)}\n")
+            f.write(f"nextShardId={self.nextShardId}\n")
+            for sp, low in zip(self.shardPrefixes, self.lowKeys):
+                f.write(f"shard={sp}\t{low}\n")
+        os.replace(tmp, path)
+
+    def _read_manifest(self, prefix: str) -> bool:
+        path = self._manifest_filename(prefix)
+        if not os.path.isfile(path):
+            return False
+
+        prefixes: List[str] = []
+        lows: List[str] = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if "=" not in line:
+                        continue
+                    k, v = line.split("=", 1)
+                    if k == "shard":
+                        sp, low = v.split("\t", 1)
+                        prefixes.append(sp)
+                        lows.append(low)
+                    elif k == "nextShardId":
+                        self.nextShardId = int(v)
+        except Exception:
+            return False
+
+        if not prefixes or lows[0] != "" or lows != sorted(lows):
+            return False
+        self.shardPrefixes = prefixes
+        self.lowKeys = lows
+        return True
+
+    # -----------------------------
+    # open/close/isOpen
+    # -----------------------------
+    def isOpen(self) -> bool:
+        return bool(self.shards) and all(s.isOpen() for s in self.shards)
+
+    def open(self, prefix: str) -> bool:
+        if self.isOpen():
+            return False
+
+        self._prefix = prefix
+        if not self._read_manifest(prefix):
+            self._prefix = None
+            return False
+
+        for sp in self.shardPrefixes:
+            db = DB()
+            if not db.open(self._shard_path(sp)):
+                for s in self.shards:
+                    s.close()
+                self.__init__()
+                return False
+            self.shards.append(db)
+            self._shardLocks.append(threading.RLock())
+            self.shardHits.append(0)
+        return True
+
+    def close(self) -> None:
+        with self._routeLock:
+            for db, lock in zip(self.shards, self._shardLocks):
+                with lock:
+                    db.close()
+            self.__init__()
+
+    # -----------------------------
+    # routing
+    # -----------------------------
+    def _route(self, name: str) -> int:
+        return max(0, bisect_right(self.lowKeys, _norm(name)) - 1)
+
+    def _acquire(self, name: str) -> Tuple[int, DB, threading.RLock]:
+        # resolve and lock the owning shard; re-check the route after locking
+        # in case a split swapped the shard out underneath us
+        while True:
+            with self._routeLock:
+                i = self._route(name)
+                db, lock = self.shards[i], self._shardLocks[i]
+            lock.acquire()
+            with self._routeLock:
+                if i < len(self.shards) and self.shards[i] is db and self._route(name) == i:
+                    self.shardHits[i] += 1
+                    return (i, db, lock)
+            lock.release()
+
+    def locate(self, name: str) -> Tuple[int, int]:
+        """
+        Returns (shardIndex, shard-local recordNum) or (-1, -1). The
+        recordNum is BUFFERED_RECORD (-2) while the record sits in that
+        shard's insert buffer; it has no place in the shard's data file
+        until the buffer is merged.
+        """
+        if not self.isOpen():
+            return (-1, -1)
+        i, db, lock = self._acquire(name)
+        try:
+            recno = db.findRecord(name)
+        finally:
+            lock.release()
+        return (i, recno) if recno != -1 else (-1, -1)
+
+    # -----------------------------
+    # public: routed record operations (same signatures as DB)
+    # -----------------------------
+    def findRecord(self,
+                   name, rank=None, city=None, state=None, zipc=None, employees=None,
+                   record: Optional[Record] = None) -> int:
+        """
+        Searches the owning shard by primary key (name).
+        Returns the shard-local recordNum or -1 (see locate() for the shard).
+        """
+        if not self.isOpen():
+            return -1
+        target = name[0] if isinstance(name, list) else str(name)
+        _, db, lock = self._acquire(target)
+        try:
+            return db.findRecord(name, rank, city, state, zipc, employees, record=record)
+        finally:
+            lock.release()
+
+    def addRecord(self, r: Record) -> bool:
+        if not self.isOpen():
+            return False
+        _, db, lock = self._acquire(r.name)
+        try:
+            return db.addRecord(r)
+        finally:
+            lock.release()
+
+    def updateRecord(self, r: Record) -> bool:
+        if not self.isOpen():
+            return False
+        _, db, lock = self._acquire(r.name)
+        try:
+            return db.updateRecord(r)
+        finally:
+            lock.release()
+
+    def deleteRecord(self, name: str) -> bool:
+        if not self.isOpen():
+            return False
+        _, db, lock = self._acquire(name)
+        try:
+            return db.deleteRecord(name)
+        finally:
+            lock.release()
+
+    # -----------------------------
+    # public: parallel fan-out scan
+    # -----------------------------
+    SCAN_BATCH_RECORDS = 1024
+    SCAN_QUEUE_BATCHES = 4
+
+    def scan(self, predicate: Optional[Callable[[Record], bool]] = None,
+             maxWorkers: Optional[int] = None) -> Iterator[Record]:
+        """
+        Scans every shard in parallel (one worker per shard) and yields the
+        matching live records shard by shard, i.e. in key-range order.
+        Each worker hands its records over through a bounded queue
+        (SCAN_QUEUE_BATCHES batches of SCAN_BATCH_RECORDS), so memory stays
+        bounded however large the shards are; shards ahead of the consumer
+        wait once their queue is full.
+        """
+        if not self.isOpen():
+            return
+
+        with self._routeLock:
+            pairs = list(zip(self.shards, self._shardLocks))
+        queues = [queue.Queue(maxsize=self.SCAN_QUEUE_BATCHES) for _ in pairs]
+        stop = threading.Event()
+
+        def put(q: queue.Queue, item: object) -> bool:
+            # give up once the consumer has gone away
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def _scan_one(i: int) -> None:
+            db, lock = pairs[i]
+            q = queues[i]
+            try:
+                with lock:
+                    if not db.isOpen():
+                        return
+                    batch: List[Record] = []
+                    for _, r in db.scan(predicate):
+                        batch.append(r)
+                        if len(batch) >= self.SCAN_BATCH_RECORDS:
+                            if not put(q, batch):
+                                return
+                            batch = []
+                    if batch and not put(q, batch):
+                        return
+            except Exception as e:
+                put(q, e)
+            finally:
+                put(q, None)
+
+        with ThreadPoolExecutor(max_workers=maxWorkers or len(pairs)) as pool:
+            for i in range(len(pairs)):
+                pool.submit(_scan_one, i)
+            try:
+                for q in queues:
+                    while True:
+                        item = q.get()
+                        if item is None:
+                            break
+                        if isinstance(item, Exception):
+                            raise item
+                        yield from item
+            finally:
+                stop.set()
+
+    # -----------------------------
+    # public: stats + split (rebalance one shard online)
+    # -----------------------------
+    def shardStats(self) -> List[Dict[str, object]]:
+        with self._routeLock:
+            return [
+                {
+                    "shard": i,
+                    "prefix": sp,
+                    "lowKey": low,
+                    "numRecords": db.numRecords,
+                    "numOverflow": db.numOverflow,
+                    "hits": hits,
+                }
+                for i, (sp, low, db, hits) in enumerate(
+                    zip(self.shardPrefixes, self.lowKeys, self.shards, self.shardHits)
+                )
+            ]
+
+    def split(self, shardIndex: int, splitKey: Optional[str] = None) -> bool:
+        """
+        Splits one shard in two at splitKey (default: the median live key).
+        Only that shard is locked while its records are rewritten; the
+        other shards keep serving requests. Overflow records are folded into
+        the sorted portion of the two new shards and deleted records dropped.
+        """
+        if not self.isOpen() or not (0 <= shardIndex < len(self.shards)):
+            return False
+
+        with self._routeLock:
+            db, lock = self.shards[shardIndex], self._shardLocks[shardIndex]
+            oldPrefix = self.shardPrefixes[shardIndex]
+            low = self.lowKeys[shardIndex]
+
+        with lock:
+            # scan() merges in any insert buffer, whose files go with the old shard
+            records = sorted((r for _, r in db.scan()), key=lambda r: _norm(r.name))
+            if len(records) < 2 and splitKey is None:
+                return False
+
+            keys = [_norm(r.name) for r in records]
+            key = _norm(splitKey) if splitKey is not None else keys[len(keys) // 2]
+            if key <= low:
+                return False
+            with self._routeLock:
+                high = self.lowKeys[shardIndex + 1] if shardIndex + 1 < len(self.lowKeys) else None
+            if high is not None and key >= high:
+                return False
+            # splitKey itself belongs to the right-hand shard
+            cut = bisect_left(keys, key)
+
+            widths = dict(db._widths)
+            with self._routeLock:
+                leftId, rightId = self.nextShardId, self.nextShardId + 1
+                self.nextShardId += 2
+            base = os.path.basename(self._prefix or "")
+            leftPrefix, rightPrefix = f"{base}.shard{leftId}", f"{base}.shard{rightId}"
+            if not create_database_from_records(self._shard_path(leftPrefix), records[:cut], widths):
+                return False
+            if not create_database_from_records(self._shard_path(rightPrefix), records[cut:], widths):
+                return False
+
+            left, right = DB(), DB()
+            if not left.open(self._shard_path(leftPrefix)) or not right.open(self._shard_path(rightPrefix)):
+                left.close()
+                right.close()
+                return False
+
+            with self._routeLock:
+                self.shards[shardIndex:shardIndex + 1] = [left, right]
+                self.shardPrefixes[shardIndex:shardIndex + 1] = [leftPrefix, rightPrefix]
+                self.lowKeys[shardIndex:shardIndex + 1] = [low, key]
+                self._shardLocks[shardIndex:shardIndex + 1] = [threading.RLock(), threading.RLock()]
+                self.shardHits[shardIndex:shardIndex + 1] = [0, 0]
+                self._write_manifest(self._prefix)
+
+            # the old shard is unreachable now; drop its files
+            db._prefix = None
+            db.close()
+            db._remove_files(self._shard_path(oldPrefix))
+        return True
+
+
+# -----------------------------
+# Create new sharded database
+# -----------------------------
+def create_sharded_database_from_csv(prefix: str,
+                                     numShards: int,
+                                     csv_filename: Optional[str] = None,
+                                     widths: Optional[Dict[str, int]] = None) -> bool:
+    """
+    Reads <prefix>.csv (or csv_filename), assumed sorted by company name, and
+    writes numShards equally sized shards plus <prefix>.manifest.
+    The CSV is read twice, streaming: once to count the rows and once to
+    write each shard's share straight into it.
+    """
+    csv_path = csv_filename or f"{prefix}.csv"
+    if not os.path.isfile(csv_path) or numShards < 1:
+        return False
+
+    with open(csv_path, newline="", encoding="utf-8") as inf:
+        total = sum(1 for _ in _records_from_csv_rows(csv.reader(inf)))
+
+    numShards = max(1, min(numShards, total))
+    base = os.path.basename(prefix)
+    sdb = ShardedDB()
+    sdb._prefix = prefix
+    with open(csv_path, newline="", encoding="utf-8") as inf:
+        rows = _records_from_csv_rows(csv.reader(inf))
+        for i in range(numShards):
+            # numShards <= total, so every shard gets at least one record
+            shard = islice(rows, (i + 1) * total // numShards - i * total // numShards)
+            first = next(shard, None)
+            sp = f"{base}.shard{i}"
+            records = chain([first], shard) if first is not None else iter(())
+            if not create_database_from_records(sdb._shard_path(sp), records, widths):
+                return False
+            sdb.shardPrefixes.append(sp)
+            sdb.lowKeys.append("" if i == 0 or first is None else _norm(first.name))
+    sdb.nextShardId = numShards
+    sdb._write_manifest(prefix)
+    return True
@@ -1,8 +1,14 @@
 
-from Database_new import DB, Record, create_database_from_csv
+import json
+import sys
+import time
+
+from Database_new import (
+    DB, Record, FIELDS, BUFFERED_RECORD, create_database_from_csv, create_database_from_csv_parallel,
+)
 
 def _print_record(recno: int, r: Record) -> None:
-    print(f"\nRecord #{recno}")
+    print("\nRecord (insert buffer)" if recno == BUFFERED_RECORD else f"\nRecord #{recno}")
     print(f"  NAME      : {r.name}")
     print(f"  RANK      : {r.rank}")
     print(f"  CITY      : {r.city}")
@@ -33,7 +39,7 @@ def main():
         print("3) Close database")
         print("4) Display record (NAME)")
         print("5) Update record (NAME)")
-        print("6) Print report (first 10 records)")
+        print("6) Print report (10 records per page)")
         print("7) Add record (append unsorted)")
         print("8) Delete record (NAME)")
         print("9) Quit")
@@ -68,10 +74,9 @@ def main():
                 print("Open a database first.")
                 continue
             key = input("Enter company NAME to display: ").strip()
-            recno, r = db._binarySearch(key)  # uses sorted portion
+            r = Record()
+            recno = db.findRecord(key, record=r)  # insert buffer, sorted portion, overflow
             if recno == -1:
-                recno, r = db._linearSearch(key)
-            if recno == -1 or r is None:
                 print("Not found.")
             else:
                 _print_record(recno, r)
@@ -81,10 +86,9 @@ def main():
                 print("Open a database first.")
                 continue
             key = input("Enter company NAME to update: ").strip()
-            recno, r = db._binarySearch(key)
+            r = Record()
+            recno = db.findRecord(key, record=r)  # insert buffer, sorted portion, overflow
             if recno == -1:
-                recno, r = db._linearSearch(key)
-            if recno == -1 or r is None:
                 print("Not found.")
                 continue
 
@@ -99,12 +103,15 @@ def main():
             if not db.isOpen():
                 print("Open a database first.")
                 continue
-            print("\n--- First 10 Records (sorted portion) ---")
-            n = min(10, db.numSortedRecords if db.numSortedRecords > 0 else 0)
-            for i in range(n):
-                ok, r = db.readRecord(i)
-                if ok and r:
+            after = None
+            while True:
+                rows = db.page(after, 10)
+                print("\n--- Records (sorted + overflow, by name) ---")
+                for i, r in rows:
                     print(f"{i:>3}: {r.name:<40} {r.city:<20} {r.state:<2} {r.zip:<10} EMP={r.employees}")
+                if len(rows) < 10 or input("Enter for next page, q to stop: ").strip().lower() == "q":
+                    break
+                after = rows[-1][1].name
 
         elif choice == "7":
             if not db.isOpen():
@@ -132,5 +139,189 @@ def main():
         else:
             print("Invalid choice.")
 
+# -----------------------------
+# Batch mode: JSONL operations in, JSONL results out
+# -----------------------------
+# One JSON object per line, e.g.
+#   {"op": "create", "prefix": "Fortune500", "csv": "Fortune500.csv", "parallel": false}
+#   {"op": "open", "prefix": "Fortune500"}
+#   {"op": "find", "name": "WALMART"}
+#   {"op": "add", "name": "ACME", "rank": "501", "city": "TULSA", "state": "OK", "zip": "74101", "employees": "12"}
+#   {"op": "update", "name": "WALMART", "employees": "2300001"}
+#   {"op": "delete", "name": "ACME"}
+#   {"op": "report", "limit": 10, "after": "WALMART"}   or   {"op": "report", "field": "employees", "k": 50}
+#   {"op": "close"}
+# Runs of consecutive find / update / delete ops are executed as one
+# findRecords / updateRecords / deleteRecords call; a name that repeats
+# within a run starts a new one, so every op sees the ones before it.
+BATCHABLE = ("find", "update", "delete")
+
+
+def _record_from_op(op: dict, existing: Record | None = None) -> Record:
+    base = dict(vars(existing)) if existing is not None else {}
+    return Record(**{f: str(op.get(f, base.get(f, ""))) for f in FIELDS})
+
+
+def _run_group(db: DB, kind: str, ops: list) -> list:
+    if not db.isOpen():
+        return [{"op": kind, "ok": False, "error": "no database open"} for _ in ops]
+
+    names = [str(op.get("name", "")) for op in ops]
+    found = db.findRecords(names)
+
+    if kind == "find":
+        return [
+            {"op": "find", "ok": recno != -1, "name": n, "recordNum": recno,
+             "record": dict(vars(r)) if r is not None else None}
+            for n, (recno, r) in zip(names, found)
+        ]
+
+    if not db._writable():
+        return [{"op": kind, "ok": False, "name": n, "recordNum": recno, "error": "database is read-only"}
+                for n, (recno, _) in zip(names, found)]
+
+    # reuse the record numbers findRecords resolved instead of looking the
+    # keys up again; names are unique within a group
+    hits = []
+    for op, (recno, r) in zip(ops, found):
+        if recno == -1:
+            continue
+        if kind == "update":
+            # fields left out of the op keep their stored value; the stored
+            # key spelling is kept
+            new = _record_from_op(op, r)
+            new.name = r.name
+        else:
+            new = Record(name=r.name)
+        hits.append((recno, new))
+    written = iter(db._write_resolved(hits))
+
+    results = []
+    for n, (recno, _) in zip(names, found):
+        if recno == -1:
+            results.append({"op": kind, "ok": False, "name": n, "recordNum": recno, "error": "not found"})
+        elif next(written):
+            results.append({"op": kind, "ok": True, "name": n, "recordNum": recno})
+        else:
+            results.append({"op": kind, "ok": False, "name": n, "recordNum": recno, "error": "write failed"})
+    return results
+
+
+def _run_single(db: DB, op: dict) -> dict:
+    kind = op.get("op")
+    if kind == "create":
+        prefix = str(op.get("prefix", ""))
+        create = create_database_from_csv_parallel if op.get("parallel") else create_database_from_csv
+        return {"op": kind, "ok": create(prefix, op.get("csv"))}
+    if kind == "open":
+        if db.isOpen():
+            db.close()
+        return {"op": kind, "ok": db.open(str(op.get("prefix", "")))}
+    if kind == "close":
+        ok = db.isOpen()
+        db.close()
+        return {"op": kind, "ok": ok}
+    if not db.isOpen():
+        return {"op": kind, "ok": False, "error": "no database open"}
+    if kind == "add":
+        return {"op": kind, "ok": db.addRecord(_record_from_op(op))}
+    if kind == "report":
+        count_key = "k" if "field" in op else "limit"
+        try:
+            count = int(op.get(count_key, 10))
+        except (TypeError, ValueError):
+            return {"op": kind, "ok": False, "error": f"{count_key} must be an integer"}
+        if "field" in op:
+            rows = db.topK(str(op["field"]), count, bool(op.get("ascending", False)))
+        else:
+            after = op.get("after")
+            rows = db.page(None if after is None else str(after), count)
+        return {"op": kind, "ok": True,
+                "records": [dict(dict(vars(r)), recordNum=recno) for recno, r in rows]}
+    return {"op": kind, "ok": False, "error": "unknown op"}
+
+
+def run_batch(lines, out=sys.stdout, db: DB | None = None) -> dict:
+    """
+    Executes JSONL operations against one DB and writes one JSONL result per
+    operation to out. Returns {op: [count, total seconds]} for the summary.
+    """
+    db = db or DB()
+    stats: dict = {}
+
+    def emit(kind: str, results: list, elapsed: float) -> None:
+        s = stats.setdefault(kind, [0, 0.0])
+        s[0] += len(results)
+        s[1] += elapsed
+        for res in results:
+            out.write(json.dumps(res) + "\n")
+
+    group_kind, group, group_names = None, [], set()
+
+    def flush_group() -> None:
+        nonlocal group_kind, group, group_names
+        if group:
+            t0 = time.perf_counter()
+            results = _run_group(db, group_kind, group)
+            emit(group_kind, results, time.perf_counter() - t0)
+        group_kind, group, group_names = None, [], set()
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            op = json.loads(line)
+        except ValueError:
+            flush_group()
+            emit("invalid", [{"op": None, "ok": False, "error": "invalid JSON"}], 0.0)
+            continue
+        if not isinstance(op, dict):
+            flush_group()
+            emit("invalid", [{"op": None, "ok": False, "error": "expected a JSON object"}], 0.0)
+            continue
+
+        kind = op.get("op")
+        if kind in BATCHABLE:
+            key = str(op.get("name", "")).strip().upper()
+            if kind != group_kind or key in group_names:
+                flush_group()
+                group_kind = kind
+            group.append(op)
+            group_names.add(key)
+            continue
+
+        flush_group()
+        t0 = time.perf_counter()
+        result = _run_single(db, op)
+        emit(str(kind), [result], time.perf_counter() - t0)
+
+    flush_group()
+    if db.isOpen():
+        db.close()
+    return stats
+
+
+def _print_latency_summary(stats: dict) -> None:
+    print("\n--- batch latency summary ---", file=sys.stderr)
+    print(f"{'op':<10} {'count':>8} {'total ms':>10} {'us/op':>10}", file=sys.stderr)
+    for kind, (count, total) in sorted(stats.items()):
+        per = total / count * 1e6 if count else 0.0
+        print(f"{kind:<10} {count:>8} {total * 1e3:>10.2f} {per:>10.1f}", file=sys.stderr)
+
+
+def batch_main(path: str) -> None:
+    if path == "-":
+        stats = run_batch(sys.stdin)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            stats = run_batch(f)
+    _print_latency_summary(stats)
+
+
 if __name__ == "__main__":
-    main()
+    # python3 TestDB_new.py --batch ops.jsonl   (or "-" for stdin)
+    if len(sys.argv) == 3 and sys.argv[1] == "--batch":
+        batch_main(sys.argv[2])
+    else:
+        main()
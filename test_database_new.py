@@ -0,0 +1,596 @@
+import contextlib
+import io
+import os
+import shutil
+import threading
+import time
+import unittest
+
+from Database_new import (
+    DB, FIELDS, Record, READAHEAD_DEPTH, convert_legacy_database, create_database_from_csv,
+    BUFFERED_RECORD, CRC_BLOCK_RECORDS, create_database_from_csv_parallel, create_database_from_records, detect_format, join,
+    main,
+)
+from testutil import TempDirCase
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _records(n: int, prefix: str = "COMPANY"):
+    return [Record(f"{prefix} {i:06d}", str(i % 500 + 1), "DALLAS", "TX", "75201", str(i)) for i in range(n)]
+
+
+# -----------------------------
+# readahead
+# -----------------------------
+class ReadaheadTest(TempDirCase):
+    def _run_with_timeout(self, fn, seconds: float = 10.0):
+        done = threading.Event()
+        result = []
+
+        def target():
+            result.append(fn())
+            done.set()
+
+        threading.Thread(target=target, daemon=True).start()
+        self.assertTrue(done.wait(seconds), "reader did not stop after the consumer exited early")
+        return result[0]
+
+    def test_break_out_of_scan_spanning_many_chunks(self):
+        prefix = self.path("ra")
+        # one chunk more than the queue holds: the reader has queued every
+        # chunk and is left holding the end-of-data sentinel
+        n = 16 * (READAHEAD_DEPTH + 1)
+        create_database_from_records(prefix, _records(n))
+        db = self.open_db(prefix)
+        db.readaheadBytes = 16 * db.recordSize
+
+        def first():
+            for recno, _ in db.scan():
+                time.sleep(0.3)  # let the reader fill the queue
+                return recno
+
+        self.assertEqual(self._run_with_timeout(first), 0)
+        # the handle is still usable afterwards
+        self.assertEqual(sum(1 for _ in db.scan()), n)
+
+
+# -----------------------------
+# parallel CSV ingest
+# -----------------------------
+class ParallelIngestTest(TempDirCase):
+    def _assert_same_as_serial(self, csv_path: str) -> None:
+        serial = self.path("serial")
+        self.assertTrue(create_database_from_csv(serial, csv_path))
+        for chunk in (1 << 20, 64):
+            parallel = self.path(f"parallel{chunk}")
+            self.assertTrue(create_database_from_csv_parallel(parallel, csv_path, workers=2, chunk_bytes=chunk))
+            for ext in (".data", ".config"):
+                with open(serial + ext, "rb") as f, open(parallel + ext, "rb") as g:
+                    self.assertEqual(f.read(), g.read(), f"{ext} differs with chunk_bytes={chunk}")
+
+    def test_shipped_csv(self):
+        self._assert_same_as_serial(os.path.join(HERE, "Fortune500cut.csv"))
+
+    def test_unicode_line_separators_inside_fields(self):
+        # csv.reader only ends rows on \n / \r; str.splitlines() also breaks on these
+        names = ["ALPHA\u2028CORP", "BETA\x1cINC", "DELTA\x85X", "EPSILON\u2029Y", "GAMMA", "ZETA\x1dZ\x1eW"]
+        csv_path = self.path("seps.csv")
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            for i, name in enumerate(names):
+                f.write(f"{name},{i + 1},DALLAS,TX,75201,{i}\n")
+        self._assert_same_as_serial(csv_path)
+        db = self.open_db(self.path("parallel64"))
+        self.assertEqual([r.name for _, r in db.scan()], names)
+
+
+# -----------------------------
+# record cache
+# -----------------------------
+class RecordCacheTest(TempDirCase):
+    def test_search_probes_are_not_cached_or_counted(self):
+        prefix = self.path("cache")
+        create_database_from_records(prefix, _records(1000))
+        db = self.open_db(prefix)
+        db.enableCache(maxEntries=64)
+        for _ in range(5):
+            self.assertEqual(db.findRecord("COMPANY 000777"), 777)
+        stats = db.cacheStats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (4, 1, 1))
+
+        db.readRecord(3)
+        db.readRecord(3)
+        stats = db.cacheStats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (5, 2, 2))
+
+
+# -----------------------------
+# insert buffer
+# -----------------------------
+class InsertBufferReadersTest(TempDirCase):
+    def setUp(self):
+        super().setUp()
+        self.prefix = self.path("buf")
+        create_database_from_records(self.prefix, _records(100))
+        self.db = self.open_db(self.prefix)
+        # memtableLimit=2: the first two inserts end up in a run, the last in the memtable
+        self.db.enableInsertBuffer(memtableLimit=2)
+        self.assertTrue(self.db.addRecord(Record("AAA FIRST", "1", "AUSTIN", "TX", "73301", "900000")))
+        self.assertTrue(self.db.addRecord(Record("COMPANY 000050 B", "2", "AUSTIN", "TX", "73301", "5")))
+        # same key as a sorted record: the buffered version replaces it
+        self.assertTrue(self.db.addRecord(Record("COMPANY 000007", "3", "AUSTIN", "TX", "73301", "7")))
+        self.assertEqual(self.db.insertBufferStats()["runs"], [2])
+        self.assertEqual(self.db.insertBufferStats()["memtable"], 1)
+        self.data_stat = os.stat(self.prefix + ".data")
+
+    def tearDown(self):
+        # reading never compacts the buffer into the data file
+        after = os.stat(self.prefix + ".data")
+        self.assertEqual((after.st_size, after.st_mtime_ns), (self.data_stat.st_size, self.data_stat.st_mtime_ns))
+        super().tearDown()
+
+    def test_scan_merges_the_buffer_in_key_order(self):
+        rows = list(self.db.scan())
+        names = [r.name for _, r in rows]
+        self.assertEqual(len(names), 102)
+        self.assertEqual(names, sorted(names))
+        self.assertEqual(rows[0], (BUFFERED_RECORD, Record("AAA FIRST", "1", "AUSTIN", "TX", "73301", "900000")))
+        self.assertEqual(dict((r.name, (n, r.city)) for n, r in rows)["COMPANY 000007"], (BUFFERED_RECORD, "AUSTIN"))
+        # record numbers of the file are left as they were
+        self.assertIn((8, _records(100)[8]), rows)
+
+    def test_scan_where_and_scan_columns(self):
+        self.assertEqual([(n, r.name) for n, r in self.db.scanWhere([("city", "==", "AUSTIN")])],
+                         [(BUFFERED_RECORD, "AAA FIRST"), (BUFFERED_RECORD, "COMPANY 000007"),
+                          (BUFFERED_RECORD, "COMPANY 000050 B")])
+        self.db.buildColumns()
+        rows = list(self.db.scanColumns(["name", "city"]))
+        self.assertEqual(len(rows), 102)
+        self.assertNotIn(("COMPANY 000007", "DALLAS"), [v for _, v in rows])
+
+    def test_page_and_top_k(self):
+        self.assertEqual(self.db.page(None, 1), [(BUFFERED_RECORD, self.db._buffer_get("AAA FIRST"))])
+        page = self.db.page("COMPANY 000006", 3)
+        self.assertEqual([(n, r.name) for n, r in page],
+                         [(BUFFERED_RECORD, "COMPANY 000007"), (8, "COMPANY 000008"), (9, "COMPANY 000009")])
+        self.assertEqual(self.db.page("COMPANY 000050", 1)[0][1].name, "COMPANY 000050 B")
+        self.assertEqual(self.db.topK("employees", 1), [(BUFFERED_RECORD, self.db._buffer_get("AAA FIRST"))])
+        # rank ties go to the record in the file
+        self.assertEqual([r.name for _, r in self.db.topK("rank", 3, ascending=True)],
+                         ["COMPANY 000000", "AAA FIRST", "COMPANY 000001"])
+
+    def test_export_and_join(self):
+        out = self.path("out.jsonl")
+        self.assertTrue(self.db.export("jsonl", out))
+        with open(out, encoding="utf-8") as f:
+            self.assertEqual(sum(1 for _ in f), 102)
+
+        create_database_from_records(self.path("other"), [Record("AAA FIRST", "1", "X", "TX", "1", "1"),
+                                                          Record("COMPANY 000007", "1", "X", "TX", "1", "1")])
+        other = self.open_db(self.path("other"))
+        pairs = list(join(other, self.db))
+        self.assertEqual([(l.name, r.name, r.city) for l, r in pairs],
+                         [("AAA FIRST", "AAA FIRST", "AUSTIN"), ("COMPANY 000007", "COMPANY 000007", "AUSTIN")])
+
+    def test_read_only_handle_sees_the_buffer(self):
+        ro = self.open_db(self.prefix, readOnly=True)
+        self.assertEqual(ro.findRecord("AAA FIRST"), BUFFERED_RECORD)
+        self.assertEqual([r.name for _, r in ro.scan()], [r.name for _, r in self.db.scan()])
+
+    def test_deleted_buffered_record_hides_the_file_version(self):
+        self.assertTrue(self.db.deleteRecord("COMPANY 000007"))
+        self.assertNotIn("COMPANY 000007", [r.name for _, r in self.db.scan()])
+        self.assertNotIn("COMPANY 000007", [r.name for _, r in self.db.page("COMPANY 000006", 1)])
+
+
+# -----------------------------
+# persisted key index
+# -----------------------------
+class IndexPersistenceTest(TempDirCase):
+    def setUp(self):
+        super().setUp()
+        self.prefix = self.path("idx")
+        create_database_from_records(self.prefix, _records(200))
+        db = self.open_db(self.prefix)
+        self.assertTrue(db.buildIndex())
+        self.assertTrue(db.addRecord(Record("AAA OVERFLOW", "1", "X", "TX", "1", "1")))
+        db.close()
+
+    def test_index_is_mapped_back_in_with_its_overflow(self):
+        self.assertTrue(os.path.isfile(self.prefix + ".idx"))
+        for readOnly in (False, True):
+            db = self.open_db(self.prefix, readOnly=readOnly)
+            self.assertTrue(db.hasIndex)
+            self.assertIsNotNone(db._indexMap)  # loaded, not rebuilt
+            self.assertEqual(db._indexOverflow, {"AAA OVERFLOW": 200})
+            self.assertEqual(db.findRecord("COMPANY 000123"), 123)
+            self.assertEqual(db.findRecord("AAA OVERFLOW"), 200)
+            self.assertEqual(db.findRecord("NOPE"), -1)
+            db.close()
+
+    def test_overflow_added_after_reopen(self):
+        db = self.open_db(self.prefix)
+        self.assertTrue(db.addRecord(Record("ZZZ LATER", "1", "X", "TX", "1", "1")))
+        self.assertEqual(db.findRecord("ZZZ LATER"), 201)
+        db.close()
+        db = self.open_db(self.prefix)
+        self.assertIsNotNone(db._indexMap)
+        self.assertEqual(db.findRecord("ZZZ LATER"), 201)
+        self.assertEqual(db.findRecord("AAA OVERFLOW"), 200)
+
+    def test_stale_index_is_rebuilt_by_writers_only(self):
+        # a writer holds the DB open and appends: the saved index is stale
+        writer = self.open_db(self.prefix)
+        self.assertTrue(writer.addRecord(Record("ZZZ LATER", "1", "X", "TX", "1", "1")))
+        idx_before = os.stat(self.prefix + ".idx").st_mtime_ns
+
+        reader = self.open_db(self.prefix, readOnly=True)
+        self.assertFalse(reader.hasIndex)
+        self.assertIsNone(reader._indexKeys)
+        self.assertEqual(reader.findRecord("COMPANY 000123"), 123)
+        self.assertEqual(reader.findRecord("ZZZ LATER"), 201)
+        reader.close()
+        self.assertEqual(os.stat(self.prefix + ".idx").st_mtime_ns, idx_before)
+        writer.close()
+
+        # the data file changed behind the index's back (its mtime is part
+        # of the fingerprint the index was saved with)
+        os.utime(self.prefix + ".data", ns=(0, 0))
+        db = self.open_db(self.prefix)
+        self.assertTrue(db.hasIndex)
+        self.assertIsNone(db._indexMap)  # rebuilt in memory
+        self.assertEqual(db.findRecord("ZZZ LATER"), 201)
+        db.close()
+        db = self.open_db(self.prefix, readOnly=True)
+        self.assertIsNotNone(db._indexMap)
+
+
+# -----------------------------
+# batched updateRecords / deleteRecords
+# -----------------------------
+class _CountingFile:
+    # counts write calls on the data file handle
+    def __init__(self, f):
+        self._f = f
+        self.writes = []
+
+    def write(self, b):
+        self.writes.append(len(b))
+        return self._f.write(b)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+class BatchWriteTest(TempDirCase):
+    def setUp(self):
+        super().setUp()
+        self.prefix = self.path("batch")
+        create_database_from_records(self.prefix, _records(300))
+
+    def open_variants(self):
+        # galloping search over the file, then the same through the index
+        for indexed in (False, True):
+            for ext in (".data", ".config"):
+                shutil.copyfile(self.prefix + ext, self.path("v") + ext)
+            db = self.open_db(self.path("v"))
+            if indexed:
+                db.buildIndex()
+            self.assertTrue(db.addRecord(Record("AAA OVERFLOW", "1", "OLD", "TX", "1", "1")))
+            self.assertTrue(db.addRecord(Record("ZZZ OVERFLOW", "1", "OLD", "TX", "1", "1")))
+            with self.subTest(indexed=indexed):
+                yield db
+            db.close()
+
+    def test_update_sorted_overflow_unknown_and_duplicate_keys(self):
+        for db in self.open_variants():
+            n = db.updateRecords([
+                Record("company 000299", "1", "A", "TX", "1", "1"),
+                Record("ZZZ OVERFLOW", "1", "B", "TX", "1", "1"),
+                Record("NOT THERE", "1", "C", "TX", "1", "1"),
+                Record("COMPANY 000000", "1", "FIRST", "TX", "1", "1"),
+                Record("AAA OVERFLOW", "1", "D", "TX", "1", "1"),
+                Record("COMPANY 000000", "1", "LAST", "TX", "1", "1"),
+            ])
+            self.assertEqual(n, 4)
+            got = {r.name: r.city for _, r in db.scan()}
+            self.assertEqual((got["COMPANY 000299"], got["ZZZ OVERFLOW"], got["AAA OVERFLOW"], got["COMPANY 000000"]),
+                             ("A", "B", "D", "LAST"))
+            self.assertNotIn("NOT THERE", got)
+            self.assertEqual(db.readRecord(299)[1].name, "COMPANY 000299")  # stored spelling kept
+
+    def test_delete_sorted_overflow_unknown_and_duplicate_keys(self):
+        for db in self.open_variants():
+            self.assertEqual(db.deleteRecords(["COMPANY 000010", "ZZZ OVERFLOW", "NOPE", "company 000010",
+                                               "AAA OVERFLOW", "COMPANY 000150"]), 4)
+            names = {r.name for _, r in db.scan()}
+            self.assertEqual(len(names), 298)
+            self.assertFalse({"COMPANY 000010", "COMPANY 000150", "AAA OVERFLOW", "ZZZ OVERFLOW"} & names)
+            # deleted records keep their key
+            self.assertEqual(db.findRecord("COMPANY 000010"), 10)
+
+    def test_adjacent_slots_are_written_together(self):
+        db = self.open_db(self.prefix)
+        counting = _CountingFile(db.dataFilestream)
+        db.dataFilestream = counting
+        names = [f"COMPANY {i:06d}" for i in (5, 7, 6, 8, 100, 101, 250)]
+        self.assertEqual(db.deleteRecords(names), 7)
+        self.assertEqual(counting.writes, [4 * db.recordSize, 2 * db.recordSize, db.recordSize])
+        db.dataFilestream = counting._f
+        self.assertTrue(all(db._is_deleted(db.readRecord(i)[1]) for i in (5, 6, 7, 8, 100, 101, 250)))
+        self.assertFalse(db._is_deleted(db.readRecord(9)[1]))
+
+
+# -----------------------------
+# column sidecars
+# -----------------------------
+class ColumnSidecarTest(TempDirCase):
+    def setUp(self):
+        super().setUp()
+        self.prefix = self.path("cols")
+        create_database_from_records(self.prefix, _records(50))
+
+    def assertColumnsMatchRows(self, db: DB) -> None:
+        # every sidecar, live flag included, agrees with the row file
+        for f in FIELDS:
+            with open(db._column_filename(self.prefix, f), "rb") as fh:
+                col = fh.read()
+            w = db._widths[f]
+            self.assertEqual(len(col), db.numRecords * w, f)
+            for recno, r in db.scan(includeDeleted=True):
+                self.assertEqual(col[recno * w : (recno + 1) * w].decode("utf-8").rstrip(), getattr(r, f), (f, recno))
+        with open(db._column_filename(self.prefix, "live"), "rb") as fh:
+            live = fh.read()
+        self.assertEqual(live, b"".join(b"0" if db._is_deleted(r) else b"1" for _, r in db.scan(includeDeleted=True)))
+
+    def test_columns_follow_add_update_and_delete(self):
+        db = self.open_db(self.prefix)
+        self.assertTrue(db.buildColumns())
+        self.assertTrue(db.addRecord(Record("ZZZ NEW", "7", "AUSTIN", "TX", "78701", "12")))
+        self.assertTrue(db.updateRecord(Record("COMPANY 000003", "3", "DALLAS", "TX", "75201", "99")))
+        self.assertTrue(db.deleteRecord("COMPANY 000004"))
+        self.assertEqual(db.updateRecords([Record("ZZZ NEW", "8", "WACO", "TX", "76701", "13")]), 1)
+        self.assertEqual(db.deleteRecords(["COMPANY 000010", "COMPANY 000011"]), 2)
+        self.assertColumnsMatchRows(db)
+        got = dict(db.scanColumns(["city"]))
+        self.assertEqual((got[3], got[50]), (("DALLAS",), ("WACO",)))
+        self.assertFalse({4, 10, 11} & got.keys())
+
+        db.close()
+        db = self.open_db(self.prefix)
+        self.assertTrue(db.hasColumns)
+        self.assertColumnsMatchRows(db)
+
+    def test_stale_sidecar_falls_back_to_row_scan(self):
+        db = self.open_db(self.prefix)
+        self.assertTrue(db.buildColumns())
+        db.close()
+        with open(self.prefix + ".live.col", "ab") as fh:
+            fh.write(b"1")
+        db = self.open_db(self.prefix)
+        self.assertFalse(db.hasColumns)
+        self.assertEqual(list(db.scanColumns(["name"])), [(i, (r.name,)) for i, r in enumerate(_records(50))])
+
+
+# -----------------------------
+# read-only opens and the find command
+# -----------------------------
+class ReadOnlyCliTest(TempDirCase):
+    def setUp(self):
+        super().setUp()
+        self.prefix = self.path("cli")
+        create_database_from_records(self.prefix, _records(20))
+
+    def run_main(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            code = main(list(args))
+        return code, out.getvalue(), err.getvalue()
+
+    def test_find_exit_codes(self):
+        code, out, _ = self.run_main("find", self.prefix, "company 000007")
+        self.assertEqual(code, 0)
+        self.assertEqual(out, "7\tCOMPANY 000007\t8\tDALLAS\tTX\t75201\t7\n")
+        self.assertEqual(self.run_main("find", self.prefix, "NOT THERE")[:2], (1, ""))
+        code, out, err = self.run_main("find", self.path("missing"), "COMPANY 000007")
+        self.assertEqual((code, out), (2, ""))
+        self.assertIn("cannot open", err)
+        code, _, err = self.run_main("find", self.prefix)
+        self.assertEqual(code, 2)
+        self.assertIn("usage", err)
+
+    def test_read_only_open_leaves_config_untouched(self):
+        db = self.open_db(self.prefix)
+        self.assertTrue(db.buildIndex())
+        self.assertTrue(db.buildColumns())
+        db.close()
+        # stale index and column sidecars: a writable open would rewrite .config
+        os.utime(self.prefix + ".data", ns=(0, 0))
+        with open(self.prefix + ".name.col", "ab") as fh:
+            fh.write(b"X")
+        with open(self.prefix + ".config", "rb") as fh:
+            config = fh.read()
+        stat = os.stat(self.prefix + ".config")
+
+        db = self.open_db(self.prefix, readOnly=True)
+        self.assertEqual(db.findRecord("COMPANY 000012"), 12)
+        db.close()
+        self.assertEqual(self.run_main("find", self.prefix, "COMPANY 000012")[0], 0)
+
+        with open(self.prefix + ".config", "rb") as fh:
+            self.assertEqual(fh.read(), config)
+        self.assertEqual(os.stat(self.prefix + ".config").st_mtime_ns, stat.st_mtime_ns)
+
+
+# -----------------------------
+# block checksums
+# -----------------------------
+class ChecksumTest(TempDirCase):
+    def setUp(self):
+        super().setUp()
+        self.prefix = self.path("crc")
+        create_database_from_records(self.prefix, _records(2 * CRC_BLOCK_RECORDS - 11))  # 501 records
+        db = self.open_db(self.prefix)
+        self.assertTrue(db.buildChecksums())
+        db.close()
+
+    def corrupt(self, recno: int) -> None:
+        db = self.open_db(self.prefix, readOnly=True)
+        size = db.recordSize
+        db.close()
+        with open(self.prefix + ".data", "r+b") as f:
+            f.seek(recno * size + 3)
+            b = f.read(1)
+            f.seek(recno * size + 3)
+            f.write(bytes([b[0] ^ 0x20]))
+
+    def crc_file_after_rebuild(self, db: DB) -> bytes:
+        with open(self.prefix + ".crc", "rb") as f:
+            kept = f.read()
+        self.assertTrue(db.buildChecksums())
+        with open(self.prefix + ".crc", "rb") as f:
+            self.assertEqual(kept, f.read())
+        return kept
+
+    def test_clean_file_verifies(self):
+        db = self.open_db(self.prefix, readOnly=True)
+        self.assertEqual(db.verify(workers=1), (True, []))
+        self.assertEqual(db.verify(workers=2), (True, []))
+
+    def test_corrupt_byte_reports_its_block(self):
+        self.corrupt(300)
+        db = self.open_db(self.prefix, readOnly=True)
+        for workers in (1, 2):
+            self.assertEqual(db.verify(workers=workers), (False, [(256, 500)]))
+
+    def test_adjacent_corrupt_blocks_are_merged(self):
+        self.corrupt(10)
+        self.corrupt(300)
+        db = self.open_db(self.prefix, readOnly=True)
+        self.assertEqual(db.verify(workers=1), (False, [(0, 500)]))
+
+    def test_updates_keep_checksums_current(self):
+        db = self.open_db(self.prefix)
+        self.assertTrue(db.updateRecord(Record("COMPANY 000003", "1", "X", "TX", "1", "1")))
+        self.assertEqual(db.updateRecords([Record("COMPANY 000255", "1", "X", "TX", "1", "1"),
+                                           Record("COMPANY 000256", "1", "X", "TX", "1", "1")]), 2)
+        self.assertTrue(db.deleteRecord("COMPANY 000400"))
+        self.assertEqual(db.verify(workers=1), (True, []))
+        self.crc_file_after_rebuild(db)
+
+    def test_appends_across_a_block_boundary(self):
+        db = self.open_db(self.prefix)
+        for i in range(13):  # 501 -> 514 records: fills block 1, starts block 2
+            self.assertTrue(db.addRecord(Record(f"ZZ NEW {i:02d}", "1", "X", "TX", "1", "1")))
+        self.assertEqual(db.numRecords, 2 * CRC_BLOCK_RECORDS + 2)
+        self.assertEqual(db.verify(workers=1), (True, []))
+        self.assertEqual(len(self.crc_file_after_rebuild(db)), 3 * 4)
+        db.close()
+
+        db = self.open_db(self.prefix)
+        self.assertEqual(db.verify(workers=1), (True, []))
+        db.close()
+        self.corrupt(2 * CRC_BLOCK_RECORDS + 1)
+        db = self.open_db(self.prefix, readOnly=True)
+        self.assertEqual(db.verify(workers=1), (False, [(512, 513)]))
+
+
+# -----------------------------
+# snapshots
+# -----------------------------
+class SnapshotTest(TempDirCase):
+    def setUp(self):
+        super().setUp()
+        self.prefix = self.path("s1")
+        create_database_from_records(self.prefix, _records(10, "S1"))
+        self.db = self.open_db(self.prefix)
+
+    def test_update_is_not_seen(self):
+        with self.db.snapshot() as snap:
+            self.assertTrue(self.db.updateRecord(Record("S1 000003", "1", "NEW", "TX", "1", "1")))
+            self.assertTrue(self.db.updateRecords([Record("S1 000004", "1", "NEW", "TX", "1", "1"),
+                                                   Record("S1 000005", "1", "NEW", "TX", "1", "1")]))
+            self.assertTrue(self.db.deleteRecord("S1 000006"))
+            self.assertEqual([r.city for _, r in snap.scan()], ["DALLAS"] * 10)
+            self.assertEqual(snap.readRecord(3), (True, _records(10, "S1")[3]))
+            got = Record()
+            self.assertEqual(snap.findRecord("S1 000006", record=got), 6)
+            self.assertEqual(got.city, "DALLAS")
+        self.assertEqual(self.db.readRecord(3)[1].city, "NEW")
+
+    def test_append_is_not_seen(self):
+        with self.db.snapshot() as snap:
+            self.assertTrue(self.db.addRecord(Record("S1 APPENDED", "1", "X", "TX", "1", "1")))
+            self.assertEqual(snap.numRecords, 10)
+            self.assertEqual(sum(1 for _ in snap.scan()), 10)
+            self.assertEqual(snap.findRecord("S1 APPENDED"), -1)
+            self.assertEqual(snap.readRecord(10), (False, None))
+        self.assertEqual(self.db.findRecord("S1 APPENDED"), 10)
+
+    def test_close_and_reopen_elsewhere_detaches_the_snapshot(self):
+        create_database_from_records(self.path("s2"), _records(10, "S2"))
+        snap = self.db.snapshot()
+        self.addCleanup(snap.close)
+        self.db.close()
+        self.assertTrue(self.db.open(self.path("s2")))
+        self.assertTrue(self.db.updateRecord(Record("S2 000000", "1", "NEW", "TX", "1", "1")))
+        self.assertEqual(snap.readRecord(0), (True, _records(10, "S1")[0]))
+        self.assertEqual([r.name for _, r in snap.scan()], [r.name for r in _records(10, "S1")])
+
+
+# -----------------------------
+# legacy Part 1 files
+# -----------------------------
+class LegacyConversionTest(TempDirCase):
+    # the shipped Part 1 files keep this name with its CSV quotes intact
+    QUOTED = {'"TOYS ""R"" US"': 'TOYS "R" US'}
+
+    def _check(self, name: str) -> None:
+        for ext in (".config", ".data"):
+            shutil.copyfile(os.path.join(HERE, name + ext), self.path(name + ext))
+        legacy = self.path(name)
+        self.assertEqual(detect_format(legacy), "part1")
+
+        db = self.open_db(legacy)
+        self.assertEqual(db.fileFormat, "part1")
+        self.assertTrue(db.readOnly)
+        self.assertFalse(db.addRecord(Record("ZZ", "1", "X", "TX", "1", "1")))
+        legacy_count = db.numRecords
+        db.close()
+
+        converted, fresh = self.path("converted"), self.path("fresh")
+        self.assertTrue(convert_legacy_database(legacy, converted))
+        self.assertTrue(create_database_from_csv(fresh, os.path.join(HERE, name + ".csv")))
+        self.assertEqual(detect_format(converted), "current")
+
+        self.assertEqual(os.path.getsize(converted + ".data"), os.path.getsize(fresh + ".data"))
+        a, b = self.open_db(converted), self.open_db(fresh)
+        self.assertEqual(a.numRecords, legacy_count)
+        self.assertEqual(a.recordSize, b.recordSize)
+
+        # the quoted name sorts apart from its unquoted twin, so compare as sets
+        got = sorted((self.QUOTED.get(r.name, r.name), r.rank, r.city, r.state, r.zip, r.employees)
+                     for _, r in a.scan())
+        want = sorted(tuple(vars(r).values()) for _, r in b.scan())
+        self.assertEqual(got, want)
+
+        # the converted file is in stored key order, so every name is found
+        keys = [r.name.strip().upper() for _, r in a.scan()]
+        self.assertEqual(keys, sorted(keys))
+        for quoted in self.QUOTED:
+            if quoted in keys:
+                self.assertNotEqual(a.findRecord(quoted), -1)
+
+        # the legacy config was left alone
+        with open(legacy + ".config", "rb") as f, open(os.path.join(HERE, name + ".config"), "rb") as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_fortune500(self):
+        self._check("Fortune500")
+
+    def test_fortune500cut(self):
+        self._check("Fortune500cut")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+import unittest
+
+from Database_new import DB, Record
+from Database_sharded import ShardedDB, create_sharded_database_from_csv
+from testutil import TempDirCase
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class ShardedDBTest(TempDirCase):
+    def setUp(self):
+        super().setUp()
+        self.prefix = self.path("sharded")
+
+    def test_more_shards_than_a_ceiling_split_can_fill(self):
+        # 10 rows in ceil-sized chunks of 2 would leave the 6th shard empty
+        csv_path = os.path.join(HERE, "Fortune500cut.csv")
+        self.assertTrue(create_sharded_database_from_csv(self.prefix, 6, csv_path))
+        sdb = ShardedDB()
+        self.assertTrue(sdb.open(self.prefix))
+        try:
+            stats = sdb.shardStats()
+            self.assertEqual(len(stats), 6)
+            self.assertTrue(all(s["numRecords"] > 0 for s in stats))
+            self.assertEqual(sum(s["numRecords"] for s in stats), 10)
+            self.assertEqual(sdb.lowKeys, sorted(sdb.lowKeys))
+        finally:
+            sdb.close()
+
+    def test_split_removes_every_file_of_the_old_shard(self):
+        csv_path = os.path.join(HERE, "Fortune500.csv")
+        self.assertTrue(create_sharded_database_from_csv(self.prefix, 1, csv_path))
+        old = os.path.join(self.tmp, "sharded.shard0")
+
+        db = DB()
+        self.assertTrue(db.open(old))
+        db.buildIndex()
+        db.buildChecksums()
+        db.buildColumns()
+        db.enableInsertBuffer(memtableLimit=2)
+        for i in range(3):
+            db.addRecord(Record(f"ZZ NEW {i}", "1", "X", "TX", "1", "1"))
+        db.close()
+        self.assertTrue(any(n.startswith("sharded.shard0.run") for n in os.listdir(self.tmp)))
+
+        sdb = ShardedDB()
+        self.assertTrue(sdb.open(self.prefix))
+        try:
+            self.assertTrue(sdb.split(0))
+            self.assertNotEqual(sdb.locate("ZZ NEW 2"), (-1, -1))
+        finally:
+            sdb.close()
+        self.assertEqual([n for n in os.listdir(self.tmp) if n.startswith("sharded.shard0.")], [])
+
+    def test_scan_streams_and_stops_early(self):
+        csv_path = os.path.join(HERE, "Fortune500.csv")
+        self.assertTrue(create_sharded_database_from_csv(self.prefix, 4, csv_path))
+        sdb = ShardedDB()
+        self.assertTrue(sdb.open(self.prefix))
+        self.addCleanup(sdb.close)
+        sdb.SCAN_BATCH_RECORDS, sdb.SCAN_QUEUE_BATCHES = 8, 1
+
+        names = [r.name for r in sdb.scan()]
+        expected = []
+        for db in sdb.shards:
+            expected.extend(r.name for _, r in db.scan())
+        self.assertEqual(names, expected)
+
+        done = threading.Event()
+
+        def first_only():
+            for r in sdb.scan():
+                time.sleep(0.3)  # every worker is now blocked on a full queue
+                break
+            done.set()
+
+        threading.Thread(target=first_only, daemon=True).start()
+        self.assertTrue(done.wait(10), "scan workers did not stop after the consumer left")
+        # every shard lock was released
+        self.assertNotEqual(sdb.locate("WALMART"), (-1, -1))
+        self.assertTrue(sdb.split(3))
+
+    def test_scan_reports_shard_errors(self):
+        csv_path = os.path.join(HERE, "Fortune500cut.csv")
+        self.assertTrue(create_sharded_database_from_csv(self.prefix, 2, csv_path))
+        sdb = ShardedDB()
+        self.assertTrue(sdb.open(self.prefix))
+        self.addCleanup(sdb.close)
+
+        def boom(r):
+            raise ValueError("bad predicate")
+
+        with self.assertRaises(ValueError):
+            list(sdb.scan(boom))
+
+    def test_create_streams_an_empty_csv(self):
+        csv_path = os.path.join(self.tmp, "empty.csv")
+        open(csv_path, "w").close()
+        self.assertTrue(create_sharded_database_from_csv(self.prefix, 3, csv_path))
+        sdb = ShardedDB()
+        self.assertTrue(sdb.open(self.prefix))
+        self.addCleanup(sdb.close)
+        self.assertEqual(sdb.lowKeys, [""])
+        self.assertEqual(list(sdb.scan()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+import os
+import unittest
+
+from Database_new import (
+    DB, Record, FIELDS, _cut_utf8, _default_widths, _pack_field, _pack_fields, _pack_fields_chars,
+    _record_size_for, _unpack_fields, create_database_from_csv,
+    create_database_from_csv_parallel, create_database_from_records,
+)
+from testutil import TempDirCase
+
+W = _default_widths()
+SIZE = _record_size_for(W)
+
+MULTILINGUAL = [
+    Record("GAZPROM ГАЗПРОМ", "12", "МОСКВА", "RU", "117997", "466000"),
+    Record("MÜNCHENER RÜCK", "80", "MÜNCHEN", "DE", "80802", "39000"),
+    Record("SOCIÉTÉ GÉNÉRALE", "200", "PARIS", "FR", "75009", "117000"),
+    Record("ΕΛΛΗΝΙΚΆ ΠΕΤΡΈΛΑΙΑ", "450", "ΑΘΉΝΑ", "GR", "15125", "3500"),
+    Record("トヨタ自動車", "10", "豊田市", "JP", "4718571", "375235"),
+    Record("日本電信電話", "60", "東京都千代田", "JP", "1008116", "338000"),
+]
+
+# 38 ASCII bytes, then one 2-byte or 3-byte character: the first name fits
+# the 40-byte name field whole, the second loses its last character
+P = "A" * 38
+CUT = [Record(P + "é", "1", "X", "TX", "1", "1"), Record(P + "日", "2", "Y", "TX", "2", "2")]
+
+
+def _stored(name: str) -> str:
+    # the name as the database keeps (and finds) it
+    return _pack_field(name, W["name"]).decode("utf-8").strip()
+
+
+# -----------------------------
+# pack / unpack
+# -----------------------------
+class PackTest(unittest.TestCase):
+    def test_records_are_byte_exact(self):
+        for r in MULTILINGUAL:
+            b = _pack_fields(r, W, SIZE)
+            self.assertEqual(len(b), SIZE)
+            self.assertTrue(b.endswith(b"\n"))
+            self.assertEqual(_unpack_fields(b, W, 0), r)
+
+    def test_fields_start_at_fixed_byte_offsets(self):
+        b = _pack_fields(MULTILINGUAL[4], W, SIZE)
+        i = 0
+        for f in FIELDS:
+            self.assertEqual(b[i : i + W[f]].rstrip().decode("utf-8"), getattr(MULTILINGUAL[4], f))
+            i += W[f]
+
+    def test_truncation_stops_on_a_character_boundary(self):
+        self.assertEqual(_cut_utf8((P + "é").encode(), 40), (P + "é").encode())
+        self.assertEqual(_cut_utf8((P + "日").encode(), 40), P.encode())
+        self.assertEqual(_cut_utf8(("A" * 39 + "é").encode(), 40), b"A" * 39)
+        self.assertEqual(_cut_utf8("日本".encode(), 2), b"")
+        for width in range(1, 12):
+            b = _pack_field("東京都千代田区", width)
+            self.assertEqual(len(b), width)
+            self.assertNotIn("�", b.decode("utf-8"))
+
+    def test_overlong_field_never_spills_into_the_next(self):
+        r = Record("N", "1", "東京都千代田区東京都千代田区東京都千代田区", "JP", "1", "1")
+        got = _unpack_fields(_pack_fields(r, W, SIZE), W, 0)
+        self.assertEqual(got.city, "東京都千代田")  # bytes 18-20 would split the 7th character
+        self.assertEqual((got.state, got.zip, got.employees), ("JP", "1", "1"))
+
+
+# -----------------------------
+# key order after truncation
+# -----------------------------
+class CutKeyOrderTest(TempDirCase):
+    def _check(self, db: DB) -> None:
+        self.assertKeyOrder(db)
+        for r in CUT:
+            got = Record()
+            self.assertNotEqual(db.findRecord(_stored(r.name), record=got), -1, r.name)
+            self.assertEqual(got.rank, r.rank)
+
+    def test_create_from_records(self):
+        create_database_from_records(self.path("cut"), CUT)
+        db = self.open_db(self.path("cut"))
+        self._check(db)
+        # zone maps follow the re-sorted file
+        self.assertEqual([r.rank for _, r in db.scanWhere([("rank", "==", 2)])], ["2"])
+
+    def _write_csv(self, rows) -> str:
+        csv_path = self.path("cut.csv")
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            for r in rows:
+                f.write(",".join(getattr(r, k) for k in FIELDS) + "\n")
+        return csv_path
+
+    def test_create_from_csv(self):
+        self.assertTrue(create_database_from_csv(self.path("cut"), self._write_csv(CUT)))
+        self._check(self.open_db(self.path("cut")))
+
+    def test_parallel_create_within_and_across_chunks(self):
+        rows = [Record(f"{P}{c}{i}", str(i), "X", "TX", "1", "1") for i, c in enumerate("éé日")]
+        rows = sorted(CUT + rows, key=lambda r: r.name)
+        csv_path = self._write_csv(rows)
+        for chunk in (1 << 20, 1):
+            self.assertTrue(create_database_from_csv_parallel(self.path("cut"), csv_path, workers=2, chunk_bytes=chunk))
+            db = self.open_db(self.path("cut"))
+            self._check(db)
+            self.assertEqual(db.numRecords, len(rows))
+            db.close()
+
+    def test_alter_widths_shrinking_the_name(self):
+        names = ["ZZ" + "A" * 8 + "é", "ZZ" + "A" * 8 + "日"]
+        create_database_from_records(self.path("alt"), [Record(n, str(i), "X", "TX", "1", "1") for i, n in enumerate(names)])
+        db = self.open_db(self.path("alt"))
+        self.assertTrue(db.addRecord(Record("AAA OVERFLOW", "9", "X", "TX", "1", "1")))
+        self.assertEqual(db.alterWidths({"name": 12}, allowTruncation=True), (True, 1))
+        self.assertEqual(db.numSortedRecords, 2)
+        self.assertEqual([r.name for _, r in db.scan()], ["ZZAAAAAAAA", "ZZAAAAAAAAé", "AAA OVERFLOW"])
+        self.assertEqual(db.findRecord("ZZAAAAAAAA"), 0)
+        self.assertEqual(db.findRecord("AAA OVERFLOW"), 2)
+
+
+# -----------------------------
+# old character layout
+# -----------------------------
+class CharLayoutTest(TempDirCase):
+    def setUp(self):
+        super().setUp()
+        self.prefix = self.path("chars")
+        rows = sorted(MULTILINGUAL, key=lambda r: r.name.upper())
+        with open(self.prefix + ".data", "wb") as f:
+            for r in rows:
+                f.write(_pack_fields_chars(r, W, SIZE))
+        with open(self.prefix + ".config", "w", encoding="utf-8") as f:
+            f.write(f"numSortedRecords={len(rows)}\nnumUnsortedRecords=0\nrecordSize={SIZE}\n")
+            f.write("widths=" + ",".join(str(W[k]) for k in FIELDS) + "\n")
+
+    def test_names_read_and_found_without_layout_flag(self):
+        db = self.open_db(self.prefix)
+        for r in MULTILINGUAL:
+            got = Record()
+            self.assertNotEqual(db.findRecord(r.name, record=got), -1, r.name)
+            self.assertEqual((got.name, got.rank), (r.name, r.rank))
+
+    def test_writes_keep_the_character_layout(self):
+        db = self.open_db(self.prefix)
+        self.assertTrue(db.updateRecord(Record("MÜNCHENER RÜCK", "81", "MÜNCHEN", "DE", "80802", "40000")))
+        db.close()
+        with open(self.prefix + ".config", encoding="utf-8") as f:
+            self.assertNotIn("layout=bytes", f.read())
+        db = self.open_db(self.prefix)
+        got = Record()
+        self.assertNotEqual(db.findRecord("MÜNCHENER RÜCK", record=got), -1)
+        self.assertEqual(got.rank, "81")
+
+    def test_alter_widths_converts_to_the_byte_layout(self):
+        db = self.open_db(self.prefix)
+        # the character layout may already have lost a trailing field of a
+        # long non-ASCII record; conversion keeps what it held
+        before = [r for _, r in db.scan()]
+        ok, _ = db.alterWidths({}, allowTruncation=True)
+        self.assertTrue(ok)
+        db.close()
+        with open(self.prefix + ".config", encoding="utf-8") as f:
+            self.assertIn("layout=bytes", f.read())
+        self.assertEqual(os.path.getsize(self.prefix + ".data"), SIZE * len(MULTILINGUAL))
+
+        db = self.open_db(self.prefix)
+        self.assertKeyOrder(db)
+        self.assertEqual([r for _, r in db.scan()], before)
+        for r in before:
+            got = Record()
+            self.assertNotEqual(db.findRecord(r.name, record=got), -1, r.name)
+            self.assertEqual(got, r)
+        # byte layout from here on: a long non-ASCII city no longer eats the next field
+        self.assertTrue(db.updateRecord(Record("日本電信電話", "60", "東京都千代田区東京都千代田区", "JP", "1008116", "338000")))
+        got = Record()
+        db.findRecord("日本電信電話", record=got)
+        self.assertEqual((got.state, got.zip, got.employees), ("JP", "1008116", "338000"))
+
+
+# -----------------------------
+# multilingual lookups
+# -----------------------------
+class MultilingualFindTest(TempDirCase):
+    def test_find_sorted_overflow_and_case(self):
+        create_database_from_records(self.path("ml"), sorted(MULTILINGUAL[:4], key=lambda r: r.name.upper()))
+        db = self.open_db(self.path("ml"))
+        for r in MULTILINGUAL[4:]:
+            self.assertTrue(db.addRecord(r))
+        for r in MULTILINGUAL:
+            got = Record()
+            self.assertNotEqual(db.findRecord(r.name, record=got), -1, r.name)
+            self.assertEqual(got, r)
+        self.assertNotEqual(db.findRecord("société générale"), -1)
+        self.assertEqual(db.findRecord("SOCIETE GENERALE"), -1)
+
+    def test_find_with_index(self):
+        create_database_from_records(self.path("ml"), sorted(MULTILINGUAL, key=lambda r: r.name.upper()))
+        db = self.open_db(self.path("ml"))
+        db.buildIndex()
+        for r in MULTILINGUAL:
+            self.assertNotEqual(db.findRecord(r.name), -1, r.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
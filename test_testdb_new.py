@@ -0,0 +1,152 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import unittest
+from unittest import mock
+
+from Database_new import BUFFERED_RECORD, DB, Record, create_database_from_csv
+from TestDB_new import main, run_batch
+from testutil import TempDirCase
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class BatchModeTest(TempDirCase):
+    def setUp(self):
+        super().setUp()
+        self.prefix = self.path("batch")
+
+    def run_ops(self, *ops) -> list:
+        lines = [op if isinstance(op, str) else json.dumps(op) for op in ops]
+        out = io.StringIO()
+        run_batch(lines, out)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def create(self) -> dict:
+        return {"op": "create", "prefix": self.prefix, "csv": os.path.join(HERE, "Fortune500cut.csv")}
+
+    def test_repeated_name_sees_earlier_update(self):
+        open_op = {"op": "open", "prefix": self.prefix}
+        results = self.run_ops(
+            self.create(), open_op,
+            {"op": "update", "name": "3M", "employees": "5"},
+            {"op": "update", "name": "3M", "city": "NEWCITY"},
+            {"op": "find", "name": "3M"},
+        )
+        self.assertTrue(all(r["ok"] for r in results), results)
+        self.assertEqual(results[-1]["record"]["employees"], "5")
+        self.assertEqual(results[-1]["record"]["city"], "NEWCITY")
+
+    def test_writes_on_read_only_handle_report_failure(self):
+        for ext in (".config", ".data"):
+            shutil.copyfile(os.path.join(HERE, "Fortune500" + ext), self.prefix + ext)
+        results = self.run_ops(
+            {"op": "open", "prefix": self.prefix},
+            {"op": "update", "name": "WALMART", "employees": "5"},
+            {"op": "delete", "name": "WALMART"},
+        )
+        self.assertTrue(results[0]["ok"])
+        self.assertEqual([r["ok"] for r in results[1:]], [False, False])
+
+        db = DB()
+        self.assertTrue(db.open(self.prefix))
+        r = db.readRecord(db.findRecord("WALMART"))[1]
+        db.close()
+        self.assertEqual(r.employees, "2300000")
+
+    def open_buffered(self) -> DB:
+        self.assertTrue(create_database_from_csv(self.prefix, os.path.join(HERE, "Fortune500cut.csv")))
+        db = DB()
+        self.assertTrue(db.open(self.prefix))
+        self.assertTrue(db.enableInsertBuffer())
+        self.assertTrue(db.addRecord(Record("ACME", "501", "TULSA", "OK", "74101", "12")))
+        return db
+
+    def run_on(self, db: DB, *ops) -> list:
+        out = io.StringIO()
+        run_batch([json.dumps(op) for op in ops], out, db=db)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_group_resolves_each_key_once(self):
+        db = self.open_buffered()
+        with mock.patch.object(DB, "_resolve_keys", autospec=True, side_effect=DB._resolve_keys) as resolve:
+            results = self.run_on(
+                db,
+                {"op": "update", "name": "3m", "employees": "5"},
+                {"op": "update", "name": "ACME", "employees": "13"},
+                {"op": "update", "name": "NO SUCH CO", "employees": "1"},
+                {"op": "find", "name": "ACME"},
+                {"op": "find", "name": "3M"},
+            )
+        self.assertEqual(resolve.call_count, 2)  # one per group
+        self.assertEqual([r["ok"] for r in results], [True, True, False, True, True])
+        self.assertEqual(results[1]["recordNum"], BUFFERED_RECORD)
+        self.assertEqual(results[2]["error"], "not found")
+        self.assertEqual(results[3]["record"]["employees"], "13")
+        self.assertEqual(results[4]["record"]["employees"], "5")
+        self.assertEqual(results[4]["record"]["name"], "3M")
+
+    def test_write_failures_are_reported_per_op(self):
+        db = self.open_buffered()
+        with mock.patch.object(DB, "_buffer_put", return_value=False):
+            results = self.run_on(
+                db,
+                {"op": "delete", "name": "3M"},
+                {"op": "delete", "name": "ACME"},
+                {"op": "delete", "name": "NO SUCH CO"},
+                {"op": "find", "name": "3M"},
+                {"op": "find", "name": "ACME"},
+            )
+        self.assertEqual([r["ok"] for r in results[:3]], [True, False, False])
+        self.assertEqual([r.get("error") for r in results[:3]], [None, "write failed", "not found"])
+        self.assertEqual(results[3]["record"]["employees"], "")
+        self.assertEqual(results[4]["record"]["employees"], "12")
+
+    def test_bad_lines_become_error_results(self):
+        results = self.run_ops(
+            self.create(), {"op": "open", "prefix": self.prefix},
+            "[1]", "not json",
+            {"op": "report", "limit": "ten"},
+            {"op": "report", "field": "employees", "k": None},
+            {"op": "report", "limit": 3},
+        )
+        self.assertEqual([r["ok"] for r in results], [True, True, False, False, False, False, True])
+        self.assertEqual(len(results[-1]["records"]), 3)
+
+
+class MenuTest(TempDirCase):
+    def setUp(self):
+        super().setUp()
+        self.prefix = self.path("menu")
+
+    def run_menu(self, *answers) -> str:
+        out = io.StringIO()
+        with mock.patch("builtins.input", side_effect=list(answers)), contextlib.redirect_stdout(out):
+            main()
+        return out.getvalue()
+
+    def test_display_and_update_find_buffered_records(self):
+        self.assertTrue(create_database_from_csv(self.prefix, os.path.join(HERE, "Fortune500cut.csv")))
+        db = DB()
+        self.assertTrue(db.open(self.prefix))
+        db.enableInsertBuffer()
+        self.assertTrue(db.addRecord(Record("ACME", "501", "TULSA", "OK", "74101", "12")))
+        db.close()
+
+        out = self.run_menu(
+            "2", self.prefix,
+            "4", "acme",
+            "5", "ACME", "", "", "", "", "99",
+            "4", "ACME",
+            "9",
+        )
+        self.assertNotIn("Not found.", out)
+        self.assertIn("Record (insert buffer)", out)
+        self.assertIn("Updated.", out)
+        self.assertIn("EMPLOYEES : 99", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from Database_new import DB
+
+
+class TempDirCase(unittest.TestCase):
+    """Test case with a fresh temporary directory, removed afterwards."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp, name)
+
+    def open_db(self, prefix: str, **kwargs) -> DB:
+        # closed again on cleanup, before the directory goes
+        db = DB()
+        self.assertTrue(db.open(prefix, **kwargs))
+        self.addCleanup(db.close)
+        return db
+
+    def assertKeyOrder(self, db: DB) -> None:
+        keys = [r.name.strip().upper() for _, r in db.scan(includeDeleted=True)]
+        self.assertEqual(keys, sorted(keys))